@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+"""
+Generates a synthetic corpus of Category Results Summary PDFs laid out like the real ones.
+
+Each PDF has the competition name, date and category as header lines above the processor's scan area and the
+results table inside it, with WD/DQ rows, categories long enough to run onto a second or third page, the odd
+Pairs or Dance category the processor skips, and the odd HTML page saved as .pdf the way the website serves a
+missing file. Competition, category and club names are drawn from the maps/*.csv files so the name mappings get
+realistic hit rates. The PDFs are written directly, so generating 10k files needs no PDF library.
+
+Usage: python benchmarks/corpus.py OUTPUT_DIR [--files 1000] [--seed 0]
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGE_WIDTH = 792
+PAGE_HEIGHT = 612
+ROW_HEIGHT = 14
+# Table rows go between these tops, inside processor.SCAN_AREA = [130, 13, 522, 775]
+TABLE_TOP = 140
+TABLE_BOTTOM = 510
+ROWS_PER_PAGE = (TABLE_BOTTOM - TABLE_TOP) // ROW_HEIGHT - 1
+COLUMNS = [(20, 'Rank'), (60, 'Competitor(s)'), (250, 'Club'), (430, 'Section'), (520, 'Points'), (590, 'TES'),
+           (650, 'PCS'), (710, 'Ded.')]
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+SECTIONS = ['AB/NT/NU', 'AB/NT/NU', 'AB/NT/NU', 'AB/NT/NU', 'BC/YT', 'SK', 'MB']
+FIRST_NAMES = ['Ava', 'Brooke', 'Chloe', 'Dylan', 'Emma', 'Finn', 'Grace', 'Hannah', 'Isla', 'Jack', 'Kate', 'Liam',
+               'Maya', 'Noah', 'Olivia', 'Paige', 'Quinn', 'Ruby', 'Sophie', 'Tessa', 'Violet', 'Wyatt', 'Zoe']
+LAST_NAMES = ['Anderson', 'Brown', 'Chen', 'Dubois', 'Evans', 'Fraser', 'Gill', 'Hughes', 'Ivanova', 'Johnson',
+              'Kim', 'Lee', 'MacDonald', 'Nguyen', 'OBrien', 'Patel', 'Roy', 'Singh', 'Tremblay', 'Wong', 'Young']
+SKIPPED_CATEGORIES = ['Junior Pairs', 'Novice Pairs', 'Pre-Novice Dance', 'Juvenile Dance', 'Adult Couples']
+MISSING_PAGE = b'<!DOCTYPE html><html><body><h1>The page you are looking for is no longer here</h1></body></html>'
+
+
+def pdf_bytes(pages, width=PAGE_WIDTH, height=PAGE_HEIGHT):
+    """Writes a minimal PDF with one Helvetica text run per (x, top, text) item on each page."""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 2 * len(pages) + 1
+    kids = []
+    for items in pages:
+        operators = []
+        for x, top, text in items:
+            text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            operators.append(f"BT /F1 9 Tf {x} {height - top - 9} Td ({text}) Tj ET")
+        stream = '\n'.join(operators).encode('latin-1', 'replace')
+        contents = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {width} {height}] /Contents {contents} 0 R "
+                        f"/Resources << /Font << /F1 {font} 0 R >> >> >>".encode()))
+    add(f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>".encode())
+    catalog = add(f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode())
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1) + b''.join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return out
+
+
+def scraped_names(csv_name, fallback):
+    """The Scraped column of a maps/*.csv file, or fallback if the file is not there."""
+    path = os.path.join(REPO_DIR, 'maps', csv_name)
+    if not os.path.exists(path):
+        return fallback
+    with open(path, encoding='utf-8-sig') as f:
+        names = sorted({row['Scraped'].strip() for row in csv.DictReader(f) if row.get('Scraped', '').strip()})
+    return names or fallback
+
+
+class Vocabulary:
+    def __init__(self):
+        self.competitions = scraped_names('comp_map.csv', ['2019 Calgary Winter Invitational'])
+        self.categories = scraped_names('category_mapping.csv', ['Pre-Novice Women (SP)'])
+        self.clubs = scraped_names('club_mapping.csv', ['Airdrie SC'])
+
+
+vocabulary = Vocabulary()
+
+
+def event_date(rng):
+    year = rng.randint(2017, 2023)
+    month = rng.choice(MONTHS)
+    if rng.random() < 0.5:
+        month = month[:3]
+    day = rng.randint(1, 26)
+    return f"{month} {day}-{day + 2}, {year}"
+
+
+def header_items(competition, date, category, venue):
+    lines = [competition] + ([venue] if venue else []) + [date, category]
+    return [(20, 20 + 14 * i, line) for i, line in enumerate(lines)]
+
+
+def results_rows(rng, category, n_rows):
+    pairs = category in SKIPPED_CATEGORIES
+    rows = []
+    points = rng.uniform(60, 160)
+    for rank in range(1, n_rows + 1):
+        points -= rng.uniform(0.5, 6)
+        competitor = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        if pairs:
+            competitor += f" / {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        tes = points * rng.uniform(0.4, 0.6)
+        rows.append([str(rank), competitor, rng.choice(vocabulary.clubs), rng.choice(SECTIONS), f"{max(points, 1):.2f}",
+                     f"{tes:.2f}", f"{max(points - tes, 0):.2f}", '0.00'])
+    # Withdrawn and disqualified skaters are listed after the ranked ones with no points
+    for status in rng.choices(['WD', 'DQ'], k=rng.choice([0, 0, 0, 1, 2])):
+        rows.append([status, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", rng.choice(vocabulary.clubs),
+                     rng.choice(SECTIONS), '', '', '', ''])
+    return rows
+
+
+def category_pdf(rng):
+    """Returns the bytes of one synthetic Category Results Summary."""
+    competition = rng.choice(vocabulary.competitions)
+    category = rng.choice(SKIPPED_CATEGORIES) if rng.random() < 0.05 else rng.choice(vocabulary.categories)
+    header = header_items(competition, event_date(rng), category, 'Calgary, AB' if rng.random() < 0.25 else None)
+    # Most categories fit on a page; a few big STAR and Adult flights run onto more
+    n_rows = rng.randint(ROWS_PER_PAGE, 3 * ROWS_PER_PAGE) if rng.random() < 0.1 else rng.randint(1, 18)
+    rows = results_rows(rng, category, n_rows)
+
+    pages = []
+    for start in range(0, len(rows), ROWS_PER_PAGE):
+        items = header + [(x, TABLE_TOP, title) for x, title in COLUMNS]
+        for i, row in enumerate(rows[start:start + ROWS_PER_PAGE], 1):
+            items += [(x, TABLE_TOP + ROW_HEIGHT * i, value) for (x, title), value in zip(COLUMNS, row) if value]
+        pages.append(items)
+    return pdf_bytes(pages)
+
+
+def file_bytes(index, seed=0):
+    """Contents of file number index in the corpus for seed; the same arguments always give the same bytes."""
+    rng = random.Random(f"{seed}-{index}")
+    if rng.random() < 0.01:
+        return MISSING_PAGE
+    return category_pdf(rng)
+
+
+def file_name(index):
+    return f"synthetic-{index:05d}CR.pdf"
+
+
+def generate_corpus(output_dir, n_files, seed=0):
+    """
+    Writes n_files synthetic PDFs to output_dir and returns their paths. A corpus already generated there with the
+    same size and seed is reused.
+    """
+    spec = {'files': n_files, 'seed': seed}
+    spec_path = os.path.join(output_dir, 'corpus.json')
+    paths = [os.path.join(output_dir, file_name(index)) for index in range(n_files)]
+    if os.path.exists(spec_path):
+        with open(spec_path) as f:
+            if json.load(f) == spec and all(os.path.exists(path) for path in paths):
+                return paths
+
+    os.makedirs(output_dir, exist_ok=True)
+    for entry in os.listdir(output_dir):
+        if entry.endswith('.pdf'):
+            os.remove(os.path.join(output_dir, entry))
+    for index, path in enumerate(paths):
+        with open(path, 'wb') as f:
+            f.write(file_bytes(index, seed))
+    with open(spec_path, 'w') as f:
+        json.dump(spec, f)
+    return paths
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('output_dir')
+    arg_parser.add_argument('--files', type=int, default=1000, help="Number of files to generate (default: 1000)")
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+    paths = generate_corpus(args.output_dir, args.files, args.seed)
+    print(f"{len(paths)} files in {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
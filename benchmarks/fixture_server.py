@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+"""
+Local HTTP server that stands in for the skating website, so the downloader and the pipeline can be benchmarked
+without touching it.
+
+It serves event pages at /events/<n>.html whose "Results" links point at synthetic Category Results Summary PDFs
+from corpus.py. Like the real site, some links lead to a missing file: either a 404 or an HTML "no longer here"
+page served with a 200. PDFs carry an ETag and Last-Modified and answer conditional requests with 304, so a
+second crawl measures the manifest's conditional GETs. --delay adds latency to every response.
+
+Usage: python benchmarks/fixture_server.py [--port 8000] [--events 20] [--pdfs-per-event 50] [--urls urls.txt]
+"""
+
+import argparse
+import hashlib
+import http.server
+import threading
+import time
+
+import corpus
+
+LAST_MODIFIED = 'Mon, 06 Mar 2023 12:00:00 GMT'
+
+
+class FixtureSite:
+    """The pages of the fake site, generated on first request and kept in memory."""
+
+    def __init__(self, events=20, pdfs_per_event=50, missing_rate=0.02, seed=0, delay=0.0):
+        self.events = events
+        self.pdfs_per_event = pdfs_per_event
+        self.missing_rate = missing_rate
+        self.seed = seed
+        self.delay = delay
+        self._pdfs = {}
+        self._lock = threading.Lock()
+
+    @property
+    def n_pdfs(self):
+        return self.events * self.pdfs_per_event
+
+    def event_path(self, event):
+        return f'/events/{event}.html'
+
+    def pdf_name(self, event, number):
+        return f'{event:04d}-{number:03d}CR.pdf'
+
+    def is_missing(self, index):
+        # Spread the missing files evenly rather than randomly so every run sees the same ones
+        return self.missing_rate > 0 and index % round(1 / self.missing_rate) == 1
+
+    def event_page(self, event):
+        links = ['<a href="/">Home</a>', '<a href="/schedule.pdf">Schedule</a>']
+        links += [f'<a href="/results/{self.pdf_name(event, number)}">Results</a>' for number in range(self.pdfs_per_event)]
+        return f'<html><body><h1>Event {event}</h1>{"".join(links)}</body></html>'.encode()
+
+    def pdf(self, name):
+        """Returns (status, content type, body) for /results/<name>."""
+        try:
+            event, number = (int(part) for part in name[:-len('CR.pdf')].split('-'))
+        except ValueError:
+            return 404, 'text/html', corpus.MISSING_PAGE
+        if event >= self.events or number >= self.pdfs_per_event:
+            return 404, 'text/html', corpus.MISSING_PAGE
+        index = event * self.pdfs_per_event + number
+        if self.is_missing(index):
+            return (404 if index % 2 else 200), 'text/html', corpus.MISSING_PAGE
+        with self._lock:
+            body = self._pdfs.get(index)
+        if body is None:
+            body = corpus.file_bytes(index, self.seed)
+            with self._lock:
+                self._pdfs[index] = body
+        return 200, 'application/pdf', body
+
+    def urls(self, base_url):
+        return [base_url + self.event_path(event) for event in range(self.events)]
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        site = self.server.site
+        if site.delay:
+            time.sleep(site.delay)
+        path = self.path.split('?')[0]
+        headers = {}
+        if path.startswith('/events/') and path.endswith('.html'):
+            try:
+                event = int(path[len('/events/'):-len('.html')])
+            except ValueError:
+                event = site.events
+            status, content_type, body = (200, 'text/html', site.event_page(event)) if event < site.events else (404, 'text/html', corpus.MISSING_PAGE)
+        elif path.startswith('/results/'):
+            status, content_type, body = site.pdf(path[len('/results/'):])
+            if content_type == 'application/pdf':
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                headers = {'ETag': etag, 'Last-Modified': LAST_MODIFIED}
+                if self.headers.get('If-None-Match') == etag:
+                    status, body = 304, b''
+        else:
+            status, content_type, body = 404, 'text/html', corpus.MISSING_PAGE
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(site, host='127.0.0.1', port=0):
+    """Starts the server on a background thread and returns it; its base URL is base_url(server)."""
+    server = http.server.ThreadingHTTPServer((host, port), FixtureHandler)
+    server.daemon_threads = True
+    server.site = site
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server):
+    host, port = server.server_address[:2]
+    return f'http://{host}:{port}'
+
+
+def write_urls(site, server, path):
+    with open(path, 'w') as f:
+        for url in site.urls(base_url(server)):
+            f.write(url + '\n')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8000)
+    arg_parser.add_argument('--events', type=int, default=20)
+    arg_parser.add_argument('--pdfs-per-event', type=int, default=50)
+    arg_parser.add_argument('--missing-rate', type=float, default=0.02, help="Share of links to missing files (default: 0.02)")
+    arg_parser.add_argument('--delay', type=float, default=0.0, help="Seconds added to every response (default: 0)")
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--urls', help="Write the event page URLs to this file, for downloader.py or pipeline.py")
+    args = arg_parser.parse_args()
+
+    site = FixtureSite(args.events, args.pdfs_per_event, args.missing_rate, args.seed, args.delay)
+    server = serve(site, args.host, args.port)
+    if args.urls:
+        write_urls(site, server, args.urls)
+    print(f"Serving {site.events} events with {site.n_pdfs} PDFs at {base_url(server)} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
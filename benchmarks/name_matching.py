@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+"""
+Measures fuzzy_match.py on synthetic competitor names: how the time grows with the number of names, and how many
+of the planted misspellings it finds.
+
+Each set has distinct made-up names, seen a few times each, plus misspellings of some of them seen once: a letter
+changed, dropped, added or swapped, the surname cut short, or "Last, First" order. propose_merges() should map each
+misspelling to its name and nothing else. For every size it reports the wall time, the microseconds per name, the
+pairs scored against the n(n-1)/2 of comparing every pair, and the precision and recall of the proposals.
+--naive also scores every pair of a sample, to compare with the blocking index on the same names.
+
+Usage: python benchmarks/name_matching.py [--sizes 10000,30000,100000] [--threshold 0.75] [--naive 2000]
+"""
+
+import argparse
+import collections
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fuzzy_match
+
+CONSONANTS = ['b', 'c', 'ch', 'd', 'f', 'g', 'h', 'j', 'k', 'l', 'm', 'n', 'p', 'r', 's', 'sh', 't', 'v', 'w', 'z']
+VOWELS = ['a', 'e', 'i', 'o', 'u', 'ai', 'ea', 'y']
+ENDINGS = ['', '', 'n', 'r', 'l', 's', 'th']
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+# Share of the names that are misspellings of another
+VARIANT_RATE = 0.2
+
+
+def made_up_name(rng, syllables):
+    return ''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) + rng.choice(ENDINGS) for _ in range(syllables)).capitalize()
+
+
+def misspell(rng, name):
+    """One misspelling of "First Last"."""
+    first, last = name.split(' ')
+    kind = rng.choice(['change', 'drop', 'add', 'swap', 'truncate', 'reorder'])
+    if kind == 'reorder':
+        return f"{last}, {first}"
+    if kind == 'truncate':
+        return f"{first} {last[:max(4, len(last) - 2)]}" if len(last) > 5 else f"{first} {last}e"
+    # Letter mistakes go in the longer word, past its first letter
+    word, other, word_first = (last, first, False) if len(last) >= len(first) else (first, last, True)
+    i = rng.randrange(1, len(word))
+    if kind == 'change':
+        word = word[:i] + rng.choice(LETTERS.replace(word[i].lower(), '')) + word[i + 1:]
+    elif kind == 'drop':
+        word = word[:i] + word[i + 1:]
+    elif kind == 'add':
+        word = word[:i] + rng.choice(LETTERS) + word[i:]
+    elif i < len(word) - 1:
+        word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    else:
+        word = word[:i - 1] + word[i] + word[i - 1]
+    return f"{word} {other}" if word_first else f"{other} {word}"
+
+
+def name_set(size, seed=0):
+    """Returns (Counter of names, {misspelling: name}) with size names in all."""
+    rng = random.Random(seed)
+    n_variants = int(size * VARIANT_RATE)
+    names = collections.Counter()
+    while len(names) < size - n_variants:
+        names[f"{made_up_name(rng, 2)} {made_up_name(rng, rng.choice([2, 3]))}"] = rng.randint(2, 5)
+    bases = list(names)
+    truth = {}
+    while len(truth) < n_variants:
+        base = rng.choice(bases)
+        variant = misspell(rng, base)
+        if variant not in names and fuzzy_match.name_key(variant, True) != fuzzy_match.name_key(base, True):
+            names[variant] = 1
+            truth[variant] = base
+    return names, truth
+
+
+def accuracy(proposals, truth):
+    """(precision, recall) of the proposals against the planted misspellings."""
+    correct = sum(1 for scraped, normalized, *rest in proposals if truth.get(scraped) == normalized)
+    return correct / max(len(proposals), 1), correct / max(len(truth), 1)
+
+
+def naive_pairs(names, threshold):
+    """Scores every pair of names, the way a matcher without blocking would. Returns {name: best match}."""
+    keys = {name: fuzzy_match.name_key(name, True) for name in names}
+    grams = {name: fuzzy_match.trigrams(key) for name, key in keys.items()}
+    best = {}
+    for name in names:
+        scores = [(fuzzy_match.similarity(keys[name], grams[name], keys[other], grams[other], True), other)
+                  for other in names if other != name]
+        score, other = max(scores)
+        if score >= threshold and names[other] > names[name]:
+            best[name] = other
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--sizes', default='10000,30000,100000', help="Comma separated numbers of names (default: 10000,30000,100000)")
+    arg_parser.add_argument('--threshold', type=float, default=fuzzy_match.THRESHOLDS['competitor'])
+    arg_parser.add_argument('--max-block', type=int, default=fuzzy_match.DEFAULT_MAX_BLOCK)
+    arg_parser.add_argument('--naive', type=int, default=0, help="Also score every pair of a sample of this many names")
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    print(f"{'names':>8}{'seconds':>9}{'us/name':>9}{'pairs scored':>14}{'all pairs':>15}{'precision':>11}{'recall':>8}")
+    for size in [int(size) for size in args.sizes.split(',')]:
+        names, truth = name_set(size, args.seed)
+        started = time.perf_counter()
+        proposals, pairs_scored = fuzzy_match.propose_merges(names, args.threshold, args.max_block)
+        seconds = time.perf_counter() - started
+        precision, recall = accuracy(proposals, truth)
+        print(f"{size:>8}{seconds:>9.2f}{seconds / size * 1e6:>9.1f}{pairs_scored:>14,}{size * (size - 1) // 2:>15,}"
+              f"{precision:>11.3f}{recall:>8.3f}")
+
+    if args.naive:
+        names, truth = name_set(args.naive, args.seed)
+        started = time.perf_counter()
+        best = naive_pairs(names, args.threshold)
+        naive_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        proposals, _ = fuzzy_match.propose_merges(names, args.threshold, args.max_block)
+        blocked_seconds = time.perf_counter() - started
+        naive_precision, naive_recall = accuracy([(name, other) for name, other in best.items()], truth)
+        precision, recall = accuracy(proposals, truth)
+        print(f"\n{args.naive} names, every pair: {naive_seconds:.2f}s, precision {naive_precision:.3f}, recall {naive_recall:.3f}")
+        print(f"{args.naive} names, blocking index: {blocked_seconds:.2f}s, precision {precision:.3f}, recall {recall:.3f}")
+
+
+if __name__ == '__main__':
+    main()
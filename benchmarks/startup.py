@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+"""
+Measures the startup time of every cli.py subcommand: the wall time of `cli.py <command> --help`, which imports
+what the command needs and exits, and which of the heavy libraries that pulls in.
+
+Usage: python benchmarks/startup.py [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['pandas', 'requests', 'selenium', 'pdfplumber', 'tabula', 'magic']
+COMMANDS = ['crawl', 'download', 'parse', 'export', 'records', 'match', 'history', 'run']
+
+
+def startup(command):
+    """Returns the wall seconds of one `cli.py <command> --help` and {top level module: cumulative import µs}."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', os.path.join(REPO_DIR, 'cli.py'), command, '--help'],
+                            cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    seconds = time.perf_counter() - start
+    imports = {}
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nested imports are indented
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            imports[parts[2].strip()] = int(parts[1])
+    return seconds, imports
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--repeat', type=int, default=5, help="Runs per command, the median is reported (default: 5)")
+    args = arg_parser.parse_args()
+
+    print(f"{'command':<10}{'median (s)':>11}{'min (s)':>9}  heavy imports (cumulative ms)")
+    for command in COMMANDS:
+        timings = []
+        for _ in range(args.repeat):
+            seconds, imports = startup(command)
+            timings.append(seconds)
+        heavy = ', '.join(f"{module} {imports[module] / 1000:.0f}" for module in HEAVY_MODULES if module in imports)
+        print(f"{command:<10}{statistics.median(timings):>11.3f}{min(timings):>9.3f}  {heavy or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+"""
+Runs every table backend over the PDF corpus and reports per-file row differences and per-backend throughput.
+
+A file is reported when the backends return a different number of rows or any cleaned Rank/Competitor/Club/
+Section/Points value differs, and when its header or a backend's scan fails. Use --diff-csv to keep every differing
+row and failure for review.
+
+Usage: python benchmarks/table_backends.py [--pdf-dir pdfs] [--limit N] [--diff-csv table_diffs.csv]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pdfplumber
+
+import processor
+
+
+def scan_with(table_backend, pdf_file, pdf_document):
+    """Returns the cleaned results table, or the exception that stopped the scan, and the seconds spent on it."""
+    start = time.perf_counter()
+    try:
+        cat_results = processor.clean_results_table(processor.scan_table(pdf_file, table_backend, pdf_document))
+    except Exception as e:
+        print(f"{table_backend} failed on {pdf_file}: {e}")
+        cat_results = e
+    return cat_results, time.perf_counter() - start
+
+
+def failure(pdf_file, step, error):
+    """A diff row recording that a step failed on a file, so the file counts as differing."""
+    return pd.DataFrame([{'File': pdf_file, 'Failed': step, 'Error': str(error)}])
+
+
+def diff_rows(pdf_file, baseline, candidate, candidate_backend):
+    """Lines the two tables up by position and returns the rows that differ in any column."""
+    baseline = baseline.reset_index(drop=True).astype(str)
+    candidate = candidate.reset_index(drop=True).astype(str)
+    merged = baseline.join(candidate, how='outer', rsuffix=f"_{candidate_backend}").fillna('<missing>')
+    differs = pd.Series(False, index=merged.index)
+    for column in baseline.columns:
+        differs |= merged[column] != merged[f"{column}_{candidate_backend}"]
+    diffs = merged[differs].copy()
+    diffs.insert(0, 'File', pdf_file)
+    return diffs
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--pdf-dir', default='pdfs')
+    arg_parser.add_argument('--limit', type=int, help="Only compare the first N PDFs")
+    arg_parser.add_argument('--diff-csv', help="Write every differing row to this CSV file")
+    args = arg_parser.parse_args()
+
+    pdf_files = sorted(os.path.join(args.pdf_dir, f) for f in os.listdir(args.pdf_dir) if f.endswith('.pdf'))[:args.limit]
+    baseline_backend, *other_backends = processor.TABLE_BACKENDS
+    elapsed = dict.fromkeys(processor.TABLE_BACKENDS, 0.0)
+    scanned = 0
+    all_diffs = []
+
+    for pdf_file in pdf_files:
+        if not processor.is_pdf(pdf_file):
+            continue
+        with pdfplumber.open(pdf_file) as pdf_document:
+            try:
+                category_name = processor.competition_details(pdf_file, pdf_document)[2]
+            except Exception as e:
+                print(f"{pdf_file}: the header could not be read: {e}")
+                all_diffs.append(failure(pdf_file, 'header', e))
+                continue
+            if processor.is_skipped_category(category_name):
+                continue
+            scanned += 1
+            baseline, seconds = scan_with(baseline_backend, pdf_file, pdf_document)
+            elapsed[baseline_backend] += seconds
+            for table_backend in other_backends:
+                candidate, seconds = scan_with(table_backend, pdf_file, pdf_document)
+                elapsed[table_backend] += seconds
+                # A backend that fails where the other one does not, or where both do, is a difference too
+                failures = [failure(pdf_file, backend, result) for backend, result in
+                            [(baseline_backend, baseline), (table_backend, candidate)] if isinstance(result, Exception)]
+                if failures:
+                    all_diffs.append(pd.concat(failures, ignore_index=True))
+                    continue
+                diffs = diff_rows(pdf_file, baseline, candidate, table_backend)
+                if not diffs.empty:
+                    print(f"{pdf_file}: {baseline_backend} {len(baseline)} rows, {table_backend} {len(candidate)} rows, "
+                          f"{len(diffs)} differing")
+                    all_diffs.append(diffs)
+
+    print(f"\n{scanned} results tables compared, {len(all_diffs)} files with differences or failures")
+    for table_backend, seconds in elapsed.items():
+        rate = scanned / seconds if seconds else 0
+        print(f"{table_backend:<12}{seconds:>9.2f} s{rate:>9.1f} files/s")
+    if args.diff_csv and all_diffs:
+        pd.concat(all_diffs, ignore_index=True).to_csv(args.diff_csv, index=False)
+
+
+if __name__ == '__main__':
+    main()
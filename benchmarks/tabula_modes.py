@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+"""
+Compares per-file tabula latency with a Java VM launched for every file against one persistent in-process JVM.
+
+tabula-py keeps the first backend it uses for the rest of the process, so each mode is timed in a fresh Python
+process of its own. The jvm row also says which backend tabula really used: without jpype1 it quietly launches
+java for every file, and then both rows time the same thing.
+
+Usage: python benchmarks/tabula_modes.py [--pdf-dir pdfs] [--sample 25]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ['subprocess', 'jvm']
+
+
+def time_mode(pdf_files, tabula_mode):
+    import processor
+    import tabula.io
+
+    latencies = []
+    failures = 0
+    for pdf_file in pdf_files:
+        start = time.perf_counter()
+        try:
+            processor.scan_table_tabula(pdf_file, tabula_mode=tabula_mode)
+        except Exception as e:
+            failures += 1
+            print(f"{pdf_file}: {str(e).splitlines()[0][:200]}", file=sys.stderr)
+        latencies.append(time.perf_counter() - start)
+    return {'latencies': latencies, 'failures': failures, 'backend': type(tabula.io._tabula_vm).__name__}
+
+
+def sample_files(args):
+    pdf_files = sorted(os.path.join(args.pdf_dir, f) for f in os.listdir(args.pdf_dir) if f.endswith('.pdf'))
+    return random.Random(args.seed).sample(pdf_files, min(args.sample, len(pdf_files)))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--pdf-dir', default='pdfs')
+    arg_parser.add_argument('--sample', type=int, default=25, help="Number of PDFs to time (default: 25)")
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.mode:
+        # Child process: times one mode and hands the results back as JSON on stdout
+        print(json.dumps(time_mode(sample_files(args), args.mode)))
+        return
+
+    print(f"{'mode':<12}{'backend':<19}{'files':>6}{'failed':>7}{'first (s)':>11}{'median (s)':>12}{'mean (s)':>10}{'total (s)':>11}")
+    for tabula_mode in MODES:
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', tabula_mode, '--pdf-dir', args.pdf_dir,
+                                '--sample', str(args.sample), '--seed', str(args.seed)], stdout=subprocess.PIPE, text=True,
+                               check=True)
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        latencies = result['latencies']
+        print(f"{tabula_mode:<12}{result['backend']:<19}{len(latencies):>6}{result['failures']:>7}{latencies[0]:>11.3f}"
+              f"{statistics.median(latencies):>12.3f}{statistics.mean(latencies):>10.3f}{sum(latencies):>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+"""
+Measures end-to-end throughput on synthetic corpora of 100, 1k and 10k Category Results Summary PDFs.
+
+Each size runs twice: cold (empty parse cache or download manifest) and warm (everything cached from the cold run).
+For each run it records the wall time, the files per second, the peak RSS, and the time per stage from the
+run report. Targets:
+    processor   processor.py over a generated PDF directory
+    downloader  downloader.py against the local fixture server
+    pipeline    pipeline.py, crawling the fixture server and parsing as it downloads
+
+Every run is a separate process started from a scratch directory, so one size does not warm up the next. The peak
+RSS is that of the largest process, which is either the script or one of its parse workers. Use --results to keep
+the measurements, and --baseline with an earlier results file to fail when files/s or peak RSS regress by more
+than --tolerance.
+
+Usage: python benchmarks/throughput.py [--target processor] [--sizes 100,1000,10000] [--workers N]
+                                       [--results results.json] [--baseline results.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import corpus
+import fixture_server
+
+REPO_DIR = corpus.REPO_DIR
+PDFS_PER_EVENT = 50
+
+
+def run_measured(command, cwd, log_path):
+    """Runs command to completion and returns (exit code, wall seconds, peak RSS in MiB)."""
+    started = time.perf_counter()
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(command, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 reports the peak RSS of the process or of the largest child it waited for, i.e. a parse worker
+        _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    max_rss = usage.ru_maxrss / 1024 if sys.platform != 'darwin' else usage.ru_maxrss / 1024 ** 2
+    return process.returncode, seconds, max_rss
+
+
+def stage_totals(report_path):
+    if not os.path.exists(report_path):
+        return {}, 0
+    with open(report_path) as f:
+        report = json.load(f)
+    return {stage: stats['total'] for stage, stats in report['stages'].items()}, len(report['errors'])
+
+
+def prepare_run_dir(run_dir):
+    """A scratch directory to run a script from, with the mapping CSVs it reads from maps/."""
+    os.makedirs(run_dir, exist_ok=True)
+    maps_dir = os.path.join(run_dir, 'maps')
+    if not os.path.exists(maps_dir):
+        try:
+            os.symlink(os.path.join(REPO_DIR, 'maps'), maps_dir)
+        except OSError:
+            shutil.copytree(os.path.join(REPO_DIR, 'maps'), maps_dir)
+
+
+def processor_args(args):
+    return ['--workers', str(args.workers), '--table-backend', args.table_backend, '--tabula-mode', args.tabula_mode,
+            '--output', args.output, '--output-dir', 'out', '--cache-dir', 'cache']
+
+
+def run_size(args, size, server, site):
+    """Runs the cold and the warm run for one corpus size and returns their measurements."""
+    run_dir = os.path.join(args.work_dir, f'{args.target}-{size}')
+    shutil.rmtree(run_dir, ignore_errors=True)
+    prepare_run_dir(run_dir)
+
+    if args.target == 'processor':
+        pdf_dir = os.path.join(args.work_dir, f'corpus-{size}')
+        corpus.generate_corpus(pdf_dir, size, args.seed)
+        command = [sys.executable, os.path.join(REPO_DIR, 'processor.py'), '--pdf-dir', pdf_dir] + processor_args(args)
+    else:
+        site.events = max(size // PDFS_PER_EVENT, 1)
+        fixture_server.write_urls(site, server, os.path.join(run_dir, 'urls.txt'))
+        if args.target == 'downloader':
+            command = [sys.executable, os.path.join(REPO_DIR, 'downloader.py')]
+        else:
+            command = [sys.executable, os.path.join(REPO_DIR, 'pipeline.py'), '--download-workers', str(args.download_workers)] + processor_args(args)
+        command += ['--max-per-host', str(args.download_workers)]
+
+    measurements = []
+    for phase in ['cold', 'warm']:
+        report_path = os.path.join(run_dir, f'{phase}_report.json')
+        returncode, seconds, max_rss = run_measured(command + ['--report', report_path], run_dir,
+                                                    os.path.join(run_dir, f'{phase}.log'))
+        stages, errors = stage_totals(report_path)
+        measurement = {
+            'target': args.target,
+            'files': size,
+            'phase': phase,
+            'returncode': returncode,
+            'seconds': round(seconds, 3),
+            'files_per_sec': round(size / seconds, 2),
+            'peak_rss_mib': round(max_rss, 1),
+            'errors': errors,
+            'stages': stages,
+        }
+        measurements.append(measurement)
+        print_measurement(measurement)
+        if returncode != 0:
+            print(f"  exited with {returncode}, see {os.path.join(run_dir, phase + '.log')}")
+    return measurements
+
+
+def print_measurement(measurement):
+    slowest = sorted(measurement['stages'].items(), key=lambda item: item[1], reverse=True)[:3]
+    stages = ', '.join(f"{stage} {seconds:.1f}s" for stage, seconds in slowest)
+    print(f"{measurement['target']:<11}{measurement['files']:>7}  {measurement['phase']:<5}{measurement['seconds']:>9.1f}s"
+          f"{measurement['files_per_sec']:>10.1f}/s{measurement['peak_rss_mib']:>9.0f} MiB  {stages}")
+
+
+def regressions(measurements, baseline, tolerance):
+    """Lines describing every measurement that is slower or bigger than its baseline by more than tolerance."""
+    previous = {(m['target'], m['files'], m['phase']): m for m in baseline}
+    found = []
+    for measurement in measurements:
+        before = previous.get((measurement['target'], measurement['files'], measurement['phase']))
+        if before is None:
+            continue
+        label = f"{measurement['target']} {measurement['files']} {measurement['phase']}"
+        if measurement['files_per_sec'] < before['files_per_sec'] * (1 - tolerance):
+            found.append(f"{label}: {measurement['files_per_sec']} files/s, was {before['files_per_sec']}")
+        if measurement['peak_rss_mib'] > before['peak_rss_mib'] * (1 + tolerance):
+            found.append(f"{label}: peak RSS {measurement['peak_rss_mib']} MiB, was {before['peak_rss_mib']}")
+    return found
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--target', choices=['processor', 'downloader', 'pipeline'], default='processor')
+    arg_parser.add_argument('--sizes', default='100,1000,10000', help="Comma separated corpus sizes (default: 100,1000,10000)")
+    arg_parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'skate_ab_benchmarks'),
+                            help="Where the corpora and runs are kept; corpora are reused between runs")
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count())
+    arg_parser.add_argument('--download-workers', type=int, default=8)
+    arg_parser.add_argument('--table-backend', default='tabula')
+    arg_parser.add_argument('--tabula-mode', default='jvm')
+    arg_parser.add_argument('--output', default='excel')
+    arg_parser.add_argument('--delay', type=float, default=0.0, help="Seconds of latency the fixture server adds (default: 0)")
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--results', help="Write the measurements to this JSON file")
+    arg_parser.add_argument('--baseline', help="Earlier --results file to compare with")
+    arg_parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed regression as a fraction (default: 0.2)")
+    args = arg_parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    server = site = None
+    if args.target != 'processor':
+        site = fixture_server.FixtureSite(pdfs_per_event=PDFS_PER_EVENT, seed=args.seed, delay=args.delay)
+        server = fixture_server.serve(site)
+
+    print(f"{'target':<11}{'files':>7}  {'phase':<5}{'wall':>10}{'files/s':>12}{'peak RSS':>13}  slowest stages")
+    measurements = []
+    try:
+        for size in [int(size) for size in args.sizes.split(',')]:
+            measurements += run_size(args, size, server, site)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    if args.results:
+        with open(args.results, 'w') as f:
+            json.dump(measurements, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(measurements, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Catalog of the PDF corpus: for every PDF its size, content hash, whether it is a PDF at all, and its header
+metadata (competition, start date, category, category type and season), so a run can select the files of one
+season, competition or category type without opening the others.
+
+The catalog is built once and updated incrementally. An entry stays as long as the file's content hash, taken from
+the parse cache manifest, is unchanged. New entries are filled from the parse cache when the file has already been
+parsed, so a PDF is only opened for the catalog when it is new to both, and then only its header strip is read.
+The header names are normalized through the maps/*.csv files, so like the parse cache the catalog records the
+fingerprint it was built with and starts over when that changes. It does not depend on the table backend.
+
+Files that are not PDFs, and files in a skipped category (Dance, Pairs, Couples), are complete once their header is
+known: the catalog marks them and hands back their parse from the entry, so they are never opened again.
+"""
+
+import json
+import os
+
+SELECTION_FIELDS = ['season', 'competition', 'category_type']
+
+
+class Catalog:
+    """{PDF path: entry}, saved as JSON next to the parse cache manifest."""
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.entries = {}
+
+        saved = self.read()
+        if saved.get('fingerprint') == fingerprint:
+            self.entries = saved.get('files', {})
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def is_current(self, pdf_file, file_info):
+        """
+        Whether the entry for a PDF describes its current contents; file_info is its parse cache manifest entry.
+        Entries of files that failed to parse are never current, so those files are retried.
+        """
+        entry = self.entries.get(pdf_file)
+        return entry is not None and entry['hash'] == file_info['hash'] and entry['error'] is None
+
+    def add(self, pdf_file, file_info, parsed, skipped):
+        """
+        Adds or replaces the entry for a PDF from a parse_file() result, complete or header only. category_type
+        and season are left for classify() to fill in.
+        """
+        competition, start_date, category = parsed["header"] if parsed["header"] is not None else (None, None, None)
+        self.entries[pdf_file] = {
+            'hash': file_info['hash'],
+            'size': file_info['size'],
+            'valid': parsed["valid"],
+            'competition': competition,
+            'start_date': start_date,
+            'category': category,
+            'category_type': None,
+            'season': None,
+            'skipped': skipped,
+            'error': parsed["error"],
+            'mapping_stats': parsed["mapping_stats"],
+        }
+
+    def classify(self, classify_headers):
+        """
+        Fills in category_type and season for the entries that have a header but not those yet.
+        classify_headers takes a DataFrame of Competition_Name, Start_Date and Category_Name and returns it with
+        Category_Type and Season columns added.
+        """
+        import pandas as pd
+
+        pending = [pdf_file for pdf_file, entry in self.entries.items()
+                   if entry['category'] is not None and entry['category_type'] is None]
+        if not pending:
+            return
+        headers = pd.DataFrame({
+            'Competition_Name': [self.entries[pdf_file]['competition'] for pdf_file in pending],
+            'Start_Date': [self.entries[pdf_file]['start_date'] for pdf_file in pending],
+            'Category_Name': [self.entries[pdf_file]['category'] for pdf_file in pending],
+        })
+        headers = classify_headers(headers)
+        for pdf_file, category_type, season in zip(pending, headers['Category_Type'], headers['Season']):
+            self.entries[pdf_file]['category_type'] = category_type
+            self.entries[pdf_file]['season'] = season
+
+    def is_complete(self, pdf_file):
+        """Whether the entry holds everything a parse of the PDF would: it is not a PDF, or its category is skipped."""
+        entry = self.entries.get(pdf_file)
+        return entry is not None and entry['error'] is None and (not entry['valid'] or entry['skipped'])
+
+    def parsed(self, pdf_file):
+        """The parse_file() result of a PDF for which is_complete() holds, rebuilt from its entry."""
+        entry = self.entries[pdf_file]
+        header = (entry['competition'], entry['start_date'], entry['category']) if entry['valid'] else None
+        return {"valid": entry['valid'], "header": header, "results": None, "unable_to_scan": False, "error": None,
+                "error_stage": None, "mapping_stats": entry['mapping_stats'], "timings": None}
+
+    def matches(self, pdf_file, season=None, competition=None, category_type=None):
+        """
+        Whether a PDF's entry matches every given criterion: the season it falls in, a case-insensitive part of the
+        competition name, and the category type. PDFs without an entry or a header match no criterion.
+        """
+        entry = self.entries.get(pdf_file)
+        if entry is None:
+            return False
+        if season is not None and entry['season'] != str(season):
+            return False
+        if competition is not None and competition.lower() not in (entry['competition'] or '').lower():
+            return False
+        if category_type is not None and (entry['category_type'] or '').lower() != category_type.lower():
+            return False
+        return True
+
+    def select(self, pdf_files, **criteria):
+        """The PDFs among pdf_files whose entries match the criteria, see matches()."""
+        return [pdf_file for pdf_file in pdf_files if self.matches(pdf_file, **criteria)]
+
+    def save(self, pdf_files):
+        """Writes the catalog for the given PDFs, dropping the entries of PDFs that are gone."""
+        self.entries = {pdf_file: self.entries[pdf_file] for pdf_file in pdf_files if pdf_file in self.entries}
+        with open(self.path, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'files': self.entries}, f, indent=1)
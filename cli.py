@@ -0,0 +1,205 @@
+#!/usr/bin/python3
+"""
+Command line entry point for the Skate AB project, with one subcommand per step:
+
+    crawl      find the Category Results Summary PDF links on the event pages in urls.txt
+    download   download the PDFs, from the crawl's list or by crawling the event pages
+    parse      parse the downloaded PDFs into the parse cache
+    export     build the tables from the parse cache and write the outputs
+    records    bring only the Personal Bests and Section/Club Records up to date and write them
+    match      propose mapping CSV additions for the unmapped names by fuzzy matching
+    history    show a competitor's results, progression or head-to-head record
+    run        crawl, download, parse and export as one streaming pipeline
+
+Each subcommand imports only the modules it needs, and those import selenium, tabula, pdfplumber and magic only
+when they are used, so e.g. `export` re-exports the cached results without loading any of them.
+
+Usage: python cli.py <command> [options], or python cli.py <command> --help
+"""
+
+import argparse
+import os
+import sys
+
+PDF_URLS_FILE = 'pdf_urls.txt'
+
+# Command -> one line description, shown by --help without importing anything
+COMMANDS = {
+    'crawl': "Find the Category Results Summary PDF links on the event pages",
+    'download': "Download the Category Results Summary PDFs",
+    'parse': "Parse the downloaded PDFs into the parse cache",
+    'export': "Build the tables from the parse cache and write the outputs",
+    'records': "Bring only the Personal Bests and Section/Club Records up to date from the parse cache and write them",
+    'match': "Propose mapping CSV additions for the unmapped names by fuzzy matching",
+    'history': "Show a competitor's results, progression or head-to-head record",
+    'run': "Crawl, download, parse and export as one streaming pipeline",
+}
+
+
+def command_parser(command, parents, **kwargs):
+    return argparse.ArgumentParser(prog=f'cli.py {command}', description=COMMANDS[command], parents=parents, **kwargs)
+
+
+def run_instrumented(args, default_report, body):
+    """Runs body() under the opt-in profiler and writes the run report, the same way the scripts' main() do."""
+    import instrumentation
+
+    try:
+        with instrumentation.profiled(args.profile):
+            body()
+    finally:
+        instrumentation.report.write(args.report or default_report, args.slowest)
+
+
+def crawl(argv):
+    import downloader
+    import instrumentation
+
+    arg_parser = command_parser('crawl', [downloader.build_arg_parser(add_help=False)])
+    arg_parser.add_argument('--pdf-urls', default=PDF_URLS_FILE,
+                            help=f"File the PDF URLs are written to, one per line (default: {PDF_URLS_FILE})")
+    args = instrumentation.add_arguments(arg_parser, default_report=downloader.REPORT_FILE).parse_args(argv)
+
+    def body():
+        browsers = downloader.BrowserPool(size=args.browsers)
+        try:
+            found = downloader.crawl(downloader.read_urls(args.urls), downloader.new_engine(args).session, browsers)
+        finally:
+            browsers.close()
+        pdf_urls = list(dict.fromkeys(pdf_url for urls in found.values() for pdf_url in urls))
+        with open(args.pdf_urls, 'w') as f:
+            for pdf_url in pdf_urls:
+                f.write(pdf_url + '\n')
+        print(f"Found {len(pdf_urls)} PDF URLs on {len(found)} event pages, written to {args.pdf_urls}")
+
+    run_instrumented(args, args.report, body)
+
+
+def download(argv):
+    import downloader
+    import instrumentation
+
+    arg_parser = command_parser('download', [downloader.build_arg_parser(add_help=False)])
+    arg_parser.add_argument('--pdf-dir', default='pdfs', help="Directory the PDFs are saved to (default: pdfs)")
+    arg_parser.add_argument('--pdf-urls', nargs='?', const=PDF_URLS_FILE,
+                            help=f"Download the URLs listed by crawl (default file: {PDF_URLS_FILE}) instead of crawling the event pages")
+    args = instrumentation.add_arguments(arg_parser, default_report=downloader.REPORT_FILE).parse_args(argv)
+
+    pdf_urls = downloader.read_urls(args.pdf_urls) if args.pdf_urls else None
+    run_instrumented(args, args.report, lambda: downloader.run(args, args.pdf_dir, pdf_urls))
+
+
+def processor_args(command, argv):
+    import instrumentation
+    import processor
+
+    arg_parser = processor.add_selection_arguments(command_parser(command, [processor.build_arg_parser(add_help=False)]))
+    args = instrumentation.add_arguments(arg_parser, default_description="<cache-dir>/run_report.json").parse_args(argv)
+    processor.configure_logging()
+    return args, args.report or os.path.join(args.cache_dir, 'run_report.json')
+
+
+def parse(argv):
+    import processor
+
+    args, report = processor_args('parse', argv)
+
+    def body():
+        pdf_files = processor.list_pdf_files(args.pdf_dir)
+        cache = processor.ParseCache(args.cache_dir, rebuild=args.rebuild, table_backend=args.table_backend)
+        parsed_files = processor.parse_selected(pdf_files, cache, args)
+        cache.save(pdf_files)
+        print(f"Parsed {len(parsed_files)} PDFs into {args.cache_dir}")
+
+    run_instrumented(args, report, body)
+
+
+def open_cache(args):
+    import processor
+
+    try:
+        return processor.ParseCache.open_existing(args.cache_dir)
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+def export(argv):
+    import processor
+
+    args, report = processor_args('export', argv)
+
+    def body():
+        cache = open_cache(args)
+        processor.write_outputs(processor.select_parsed(cache.cached_parses(), cache, args), cache, args)
+
+    run_instrumented(args, report, body)
+
+
+def records(argv):
+    import processor
+
+    args, report = processor_args('records', argv)
+
+    def body():
+        cache = open_cache(args)
+        processor.write_records(processor.select_parsed(cache.cached_parses(), cache, args), cache, args)
+
+    run_instrumented(args, report, body)
+
+
+def match(argv):
+    import fuzzy_match
+
+    args = command_parser('match', [fuzzy_match.build_arg_parser(add_help=False)]).parse_args(argv)
+    try:
+        fuzzy_match.run(args)
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+def history(argv):
+    import history
+
+    args = command_parser('history', [history.build_arg_parser(add_help=False)]).parse_args(argv)
+    try:
+        history.run(args)
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+def run(argv):
+    import pipeline
+
+    pipeline.main(argv)
+
+
+HANDLERS = {
+    'crawl': crawl,
+    'download': download,
+    'parse': parse,
+    'export': export,
+    'records': records,
+    'match': match,
+    'history': history,
+    'run': run,
+}
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='cli.py', description="Command line entry point for the Skate AB project.",
+                                         formatter_class=argparse.RawDescriptionHelpFormatter,
+                                         epilog='\n'.join(f"  {command:<10} {help}" for command, help in COMMANDS.items()))
+    arg_parser.add_argument('command', choices=COMMANDS, metavar='command', help="One of " + ', '.join(COMMANDS))
+    arg_parser.add_argument('options', nargs=argparse.REMAINDER, help="Options for the command, see cli.py <command> --help")
+    return arg_parser
+
+
+def main(argv=None):
+    # Only the chosen command's parser is built, since building the others would import their modules
+    args = build_arg_parser().parse_args(argv)
+    HANDLERS[args.command](args.options)
+
+
+# The guard keeps parse workers from re-running main() on platforms that spawn rather than fork
+if __name__ == '__main__':
+    main()
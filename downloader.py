@@ -1,13 +1,24 @@
 #!/usr/bin/python3
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver import Firefox
+from html.parser import HTMLParser
 import re
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlsplit, urljoin
 import concurrent.futures
+import contextlib
+import threading
+import tempfile
+import argparse
+import hashlib
+import itertools
+import json
+import time
 import os
 
+import instrumentation
+
 missing_urls = []
 
 def read_urls(file_path):
@@ -15,101 +26,505 @@ def read_urls(file_path):
         urls = [line.strip() for line in f]
     return urls
 
-import re
+BASE_URL = 'https://skateabnwtnun.ca/'
+# STAR 2 to 4 are not to be included in this data set because they do not use IJS
+CATEGORIES_TO_EXCLUDE = ['star2', 'star-2', 'star3', 'star-3', 'star4', 'star-4', 'team']
 
-import re
 
-def scrape_pdf_urls(url):
-    print(f'Attempting to get PDF URLS for {url}')
-    options = webdriver.FirefoxOptions()
-    options.add_argument('-headless')
-    driver = Firefox(options=options)
+class LinkCollector(HTMLParser):
+    """Collects (text, href, onclick) for every link on a page."""
+
+    def __init__(self, page_url):
+        super().__init__()
+        self.page_url = page_url
+        self.links = []
+        self._open_links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            attrs = dict(attrs)
+            # Resolve the href the way the browser's link.href does
+            href = urljoin(self.page_url, attrs['href']) if attrs.get('href') else None
+            self._open_links.append([[], href, attrs.get('onclick')])
+
+    def handle_data(self, data):
+        for link in self._open_links:
+            link[0].append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self._open_links:
+            text, href, onclick = self._open_links.pop()
+            self.links.append((''.join(text), href, onclick))
+
 
-    # Open the webpage
-    driver.get(url)
+def is_results_link(text):
+    return 'results' in (text or '').lower()
 
-    # Find all the links with the text "RESULTS" and the onclick attribute
-    result_links = driver.find_elements(By.XPATH, "//a[text()='RESULTS'][@onclick]")
 
-    # Find all the links with the text "Results" and the href attribute
-    result_links_direct = driver.find_elements(By.XPATH, "//a[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'results')]")
+def is_wanted_pdf(pdf_url):
+    """Only Category Results Summary sheets (CR.pdf, CR-#.pdf), and not the excluded categories."""
+    return ('CR-' in pdf_url or 'CR.' in pdf_url) and not any(word in pdf_url.lower() for word in CATEGORIES_TO_EXCLUDE)
 
-    # Extract the PDF URLs from the onclick attribute
-    base_url = 'https://skateabnwtnun.ca/'
+
+def filter_pdf_links(links, base_url=BASE_URL):
+    """
+    Picks the Category Results Summary PDF URLs out of a page's links, given as (text, href, onclick) tuples.
+    Used for both the static HTML and the browser-rendered page.
+    """
     pdf_urls = []
-    
-    categories_to_exclude = ['star2', 'star-2', 'star3', 'star-3', 'star4', 'star-4', 'team']
-    
-    for link in result_links:
-        onclick_attr = link.get_attribute("onclick")
-        pdf_url = onclick_attr.split("('/")[1].split(".pdf'")[0] + ".pdf"
-        pdf_url = base_url + pdf_url
-        # STAR 4 is not to be included in this data set because it does not use IJS
-        
-        if ('CR-' in pdf_url or 'CR.' in pdf_url) and not any(word in pdf_url.lower() for word in categories_to_exclude):
-            pdf_urls.append(pdf_url)
-
-    # Extract the PDF URLs from the href attribute
-    for link in result_links_direct:
-        href_attr = link.get_attribute("href")
+    for text, href_attr, onclick_attr in links:
+        if not is_results_link(text):
+            continue
+
+        # Links with the text "RESULTS" open the PDF from their onclick attribute
+        if text.strip() == 'RESULTS' and onclick_attr and "('/" in onclick_attr:
+            pdf_url = base_url + onclick_attr.split("('/")[1].split(".pdf'")[0] + ".pdf"
+            if is_wanted_pdf(pdf_url):
+                pdf_urls.append(pdf_url)
+
+        if not href_attr:
+            continue
         # Only get Category Results Summary sheets from the older style archive. These will end in CR.pdf or CR-#.pdf
-        if href_attr and (href_attr.endswith("CR.pdf") or re.match(r".*CR-\d+\.pdf$", href_attr)): 
+        if href_attr.endswith("CR.pdf") or re.match(r".*CR-\d+\.pdf$", href_attr):
             pdf_url = href_attr
             if pdf_url.startswith('/'):
                 pdf_url = base_url + pdf_url[1:]
-            if ('CR-' in pdf_url or 'CR.' in pdf_url) and not any(word in pdf_url.lower() for word in categories_to_exclude):
+            if is_wanted_pdf(pdf_url):
                 pdf_urls.append(pdf_url)
-        
+
         # Extract PDF URLs with query parameters
-        if href_attr and href_attr.endswith(".pdf") and "?" in href_attr:
+        if href_attr.endswith(".pdf") and "?" in href_attr:
             pdf_urls.append(href_attr.replace("?", ""))
 
         # Extract PDF URLs with query parameters using regular expressions
         pdf_urls_with_query = re.findall(r'(?P<url>https?://\S+\.pdf\?.+)', href_attr)
         for pdf_url in pdf_urls_with_query:
             pdf_urls.append(pdf_url.replace("?", ""))
-
-    # Close the browser
-    driver.quit()
     return pdf_urls
 
 
+def static_links(url, session):
+    """Fetches the event page without a browser and returns its links, or None if it has no results links."""
+    response = session.get(url, timeout=30)
+    response.raise_for_status()
+    collector = LinkCollector(response.url)
+    collector.feed(response.text)
+    if not any(is_results_link(text) for text, href, onclick in collector.links):
+        return None
+    return collector.links
+
+
+class BrowserPool:
+    """
+    A bounded pool of long-lived headless Firefox drivers, shared by every event that needs JavaScript.
+
+    Drivers are started on first use, up to size of them, and reused until close(). A driver that fails is quit
+    and replaced by a fresh one on the next request. A request that finds every driver busy waits until one is
+    returned, or until a start fails or a driver is discarded, in which case it starts a driver itself.
+    """
+
+    def __init__(self, size=2):
+        self.size = size
+        self._idle = []
+        self._started = 0
+        self._drivers = []
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+
+    @contextlib.contextmanager
+    def driver(self):
+        from selenium import webdriver
+        from selenium.common.exceptions import WebDriverException
+
+        with self._available:
+            while not self._idle and self._started >= self.size:
+                self._available.wait()
+            driver = self._idle.pop() if self._idle else None
+            if driver is None:
+                self._started += 1
+        if driver is None:
+            try:
+                options = webdriver.FirefoxOptions()
+                options.add_argument('-headless')
+                driver = webdriver.Firefox(options=options)
+            except BaseException:
+                self._release_slot()
+                raise
+            with self._lock:
+                self._drivers.append(driver)
+
+        healthy = True
+        try:
+            yield driver
+        except WebDriverException:
+            healthy = False
+            raise
+        finally:
+            if healthy:
+                with self._available:
+                    self._idle.append(driver)
+                    self._available.notify()
+            else:
+                self._discard(driver)
+
+    def _release_slot(self):
+        """Frees the slot of a driver that failed to start or was discarded, so a waiting request can start one."""
+        with self._available:
+            self._started -= 1
+            self._available.notify()
+
+    def _discard(self, driver):
+        from selenium.common.exceptions import WebDriverException
+
+        with self._lock:
+            self._drivers.remove(driver)
+        self._release_slot()
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def close(self):
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+            self._idle = []
+        for driver in drivers:
+            driver.quit()
+
+
+def browser_links(url, browsers):
+    """Renders the event page in a pooled browser and returns its links."""
+    with browsers.driver() as driver:
+        driver.get(url)
+        return driver.execute_script(
+            "return Array.from(document.querySelectorAll('a'), a => [a.textContent, a.href || null, a.getAttribute('onclick')]);")
+
+
+def scrape_pdf_urls(url, session=None, browsers=None):
+    """
+    Finds the Category Results Summary PDF URLs on an event page. The plain HTML is tried first; a browser is
+    only used when the page has no results links without running its JavaScript.
+    """
+    print(f'Attempting to get PDF URLS for {url}')
+    with instrumentation.report.stage('scrape_pdf_urls', url):
+        links = None
+        try:
+            with instrumentation.report.stage('static_links', url):
+                links = static_links(url, session or requests.Session())
+        except requests.RequestException as exc:
+            print(f'Unable to fetch {url} without a browser: {exc}')
+
+        if links is None:
+            print(f'Rendering {url} in a browser')
+            owns_pool = browsers is None
+            browsers = browsers or BrowserPool(size=1)
+            try:
+                with instrumentation.report.stage('browser_links', url):
+                    links = browser_links(url, browsers)
+            finally:
+                if owns_pool:
+                    browsers.close()
+        return filter_pdf_links(links)
+
 
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+}
+CHUNK_SIZE = 64 * 1024
+MANIFEST_FILE = 'download_manifest.json'
+REPORT_FILE = 'download_report.json'
 
 
-def download_pdfs(pdf_urls, output_dir):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-    }
+class DownloadManifest:
+    """
+    What has been downloaded so far, persisted as JSON next to the pdfs/ directory.
 
-    for url in pdf_urls:
-        # Get the filename from the URL
+    Each URL maps to the ETag and Last-Modified the server sent, the size and SHA-256 of the content, and the local
+    path it was saved to. The manifest is what lets a re-crawl send conditional requests and recognise a PDF that is
+    linked under several URLs.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def get(self, url):
+        """Returns the entry for a URL if its file is still on disk, otherwise None."""
+        with self._lock:
+            entry = self.entries.get(url)
+        if entry and os.path.exists(entry['path']):
+            return entry
+        return None
+
+    def path_for_hash(self, content_hash):
+        """Returns a file already on disk with the given content, or None."""
+        with self._lock:
+            for entry in self.entries.values():
+                if entry['sha256'] == content_hash and os.path.exists(entry['path']):
+                    return entry['path']
+        return None
+
+    def move(self, old_path, new_path):
+        """Points the URLs saved at old_path to new_path, which holds the same content."""
+        with self._lock:
+            for entry in self.entries.values():
+                if entry['path'] == old_path:
+                    entry['path'] = new_path
+
+    def record(self, url, response, size, content_hash, path):
+        with self._lock:
+            self.entries[url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'size': size,
+                'sha256': content_hash,
+                'path': path,
+            }
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(self.entries, f, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+
+
+class DownloadEngine:
+    """
+    Downloads PDFs over one pooled requests.Session.
+
+    Connections are kept alive and reused, at most max_per_host requests run against a host at once, and the
+    session retries connection errors and 429/5xx responses with exponential backoff. A body cut off part way is
+    requested again, up to the same number of retries. Each PDF is streamed to a temporary file in the output
+    directory and renamed into place once complete, so an interrupted download never leaves a truncated PDF behind.
+
+    Missing files are recognised from the response itself rather than by decoding the whole body: the Skate AB site
+    answers a missing PDF with an HTML page (often with a 200 status), so anything that is not a PDF by its
+    Content-Type and first bytes is treated as missing.
+
+    With a DownloadManifest, a URL downloaded before is requested with If-None-Match/If-Modified-Since and a 304
+    answer costs no transfer, and a PDF whose content matches a file already on disk is not saved a second time
+    unless the new copy has the .pdf name the processor reads and the one on disk does not, in which case the new
+    copy replaces it.
+    """
+
+    def __init__(self, max_per_host=4, retries=3, backoff=0.5, timeout=30, session=None, manifest=None):
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.session.headers.update(HEADERS)
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=['GET', 'HEAD'])
+        adapter = HTTPAdapter(pool_connections=max_per_host, pool_maxsize=max_per_host, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.manifest = manifest or DownloadManifest()
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    def host_limit(self, url):
+        """Returns the semaphore bounding concurrent requests to the URL's host."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    def fetch(self, url, output_dir):
+        """
+        Downloads one PDF into output_dir.
+
+        Returns:
+            - tuple: The local path of the PDF (None if the server does not have it) and what happened: 'downloaded',
+              'unchanged' (the server answered 304), 'duplicate' (same content as a file already saved) or 'missing'.
+        """
+        # The session's Retry handles failed connections and error statuses. urllib3 does not retry a body that is
+        # cut off once streaming has started, so only that is retried here
+        with instrumentation.report.stage('download', url):
+            for attempt in range(self.retries + 1):
+                try:
+                    return self._fetch(url, output_dir)
+                except requests.exceptions.ChunkedEncodingError:
+                    if attempt == self.retries:
+                        raise
+                    time.sleep(self.backoff * 2 ** attempt)
+
+    def _fetch(self, url, output_dir):
         filename = url.split('/')[-1]
+        known = self.manifest.get(url)
+        headers = {}
+        if known and known['etag']:
+            headers['If-None-Match'] = known['etag']
+        if known and known['last_modified']:
+            headers['If-Modified-Since'] = known['last_modified']
+
+        with self.host_limit(url):
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 304 and known:
+                    return known['path'], 'unchanged'
+                chunks = response.iter_content(CHUNK_SIZE)
+                first_chunk = next(chunks, b'')
+                content_type = response.headers.get('Content-Type', '')
+                if response.status_code >= 400 or not is_pdf_response(content_type, first_chunk):
+                    return None, 'missing'
+
+                digest = hashlib.sha256()
+                size = 0
+                with tempfile.NamedTemporaryFile(dir=output_dir, prefix=filename, suffix='.part', delete=False) as f:
+                    try:
+                        for chunk in itertools.chain([first_chunk], chunks):
+                            f.write(chunk)
+                            digest.update(chunk)
+                            size += len(chunk)
+                    except BaseException:
+                        f.close()
+                        os.remove(f.name)
+                        raise
 
-        # Send a GET request to the URL and save the PDF file to the specified output directory
-        response = requests.get(url, headers=headers)
-        if 'The page you are looking for is no longer here' in response.text:
-            print(f'Skipping file {url} as it does not exist on the server.')
-            missing_urls.append(url)
-        else:
-            with open(os.path.join(output_dir, filename), 'wb') as f:
-                f.write(response.content)
-                print(f'Saved file {filename} to {output_dir}')
+        content_hash = digest.hexdigest()
+        path = os.path.join(output_dir, filename)
+        existing_path = self.manifest.path_for_hash(content_hash)
+        # The processor only reads names ending in .pdf, so a copy saved under a name that lost its "?"
+        # ("GoldWomenArtisticCR.pdfver=2") gives way to the .pdf name instead of hiding it
+        if existing_path and existing_path != path and (existing_path.endswith('.pdf') or not path.endswith('.pdf')):
+            os.remove(f.name)
+            self.manifest.record(url, response, size, content_hash, existing_path)
+            return existing_path, 'duplicate'
+        os.replace(f.name, path)
+        self.manifest.record(url, response, size, content_hash, path)
+        if existing_path and existing_path != path:
+            self.manifest.move(existing_path, path)
+            os.remove(existing_path)
+        return path, 'downloaded'
+
+def is_pdf_response(content_type, first_bytes):
+    """A response is a PDF if it starts with the PDF signature, or claims to be one and is not an HTML page."""
+    if first_bytes.lstrip().startswith(b'%PDF'):
+        return True
+    return 'pdf' in content_type.lower() and not first_bytes.lstrip().lower().startswith((b'<!doctype', b'<html'))
+
+
+def download_pdfs(pdf_urls, output_dir, engine=None):
+    engine = engine or DownloadEngine()
+    os.makedirs(output_dir, exist_ok=True)
+    # The same link is often scraped more than once for an event
+    pdf_urls = list(dict.fromkeys(pdf_urls))
+
+    # The files for one event are fetched concurrently; the engine's per-host limit keeps the load on the server bounded
+    with concurrent.futures.ThreadPoolExecutor(max_workers=engine.max_per_host) as executor:
+        futures = {executor.submit(engine.fetch, url, output_dir): url for url in pdf_urls}
+        for future in concurrent.futures.as_completed(futures):
+            url = futures[future]
+            try:
+                path, status = future.result()
+            except requests.RequestException as exc:
+                print(f'Failed to download {url}: {exc}')
+                instrumentation.report.error('download', url, exc)
+                continue
+            if status == 'missing':
+                print(f'Skipping file {url} as it does not exist on the server.')
+                missing_urls.append(url)
+            elif status == 'downloaded':
+                print(f'Saved file {os.path.basename(path)} to {output_dir}')
+            elif status == 'duplicate':
+                print(f'Skipping file {url} as it has the same content as {path}')
+    engine.manifest.save()
             
 
-def download_pdfs_wrapper(url):
-    download_pdfs(scrape_pdf_urls(url), 'pdfs')
+def download_pdfs_wrapper(url, engine=None, browsers=None, output_dir='pdfs'):
+    engine = engine or DownloadEngine()
+    pdf_urls = scrape_pdf_urls(url, engine.session, browsers)
+    with instrumentation.report.stage('download_pdfs', url):
+        download_pdfs(pdf_urls, output_dir, engine)
+
+
+def crawl(event_urls, session=None, browsers=None, workers=10):
+    """Scrapes the event pages concurrently and returns {event URL: [PDF URLs]} for the pages that could be read."""
+    pdf_urls = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(scrape_pdf_urls, url, session, browsers): url for url in event_urls}
+        for future in concurrent.futures.as_completed(futures):
+            url = futures[future]
+            try:
+                pdf_urls[url] = future.result()
+            except Exception as exc:
+                print(f'Unable to get the PDF URLs for {url}: {exc}')
+                instrumentation.report.error('scrape_pdf_urls', url, exc)
+    return {url: pdf_urls[url] for url in event_urls if url in pdf_urls}
+
+
+def build_arg_parser(add_help=True):
+    arg_parser = argparse.ArgumentParser(description="Download the Category Results Summary PDFs for the events in urls.txt.",
+                                         add_help=add_help)
+    arg_parser.add_argument('--urls', default='urls.txt', help="File of event page URLs, one per line (default: urls.txt)")
+    arg_parser.add_argument('--max-per-host', type=int, default=4, help="Concurrent downloads per host (default: 4)")
+    arg_parser.add_argument('--retries', type=int, default=3, help="Retries for failed requests, with backoff (default: 3)")
+    arg_parser.add_argument('--timeout', type=float, default=30, help="Seconds to wait for the server (default: 30)")
+    arg_parser.add_argument('--manifest', default=MANIFEST_FILE,
+                            help=f"Download manifest used for conditional requests and de-duplication (default: {MANIFEST_FILE})")
+    arg_parser.add_argument('--browsers', type=int, default=2,
+                            help="Most headless Firefox instances kept for event pages that need JavaScript (default: 2)")
+    return arg_parser
+
 
-with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-    futures = []
-    for url in read_urls('urls.txt'):
-        futures.append(executor.submit(download_pdfs_wrapper, url))
-    for future in concurrent.futures.as_completed(futures):
+def parse_args(argv=None):
+    arg_parser = instrumentation.add_arguments(build_arg_parser(), default_report=REPORT_FILE)
+    return arg_parser.parse_args(argv)
+
+
+def new_engine(args):
+    return DownloadEngine(max_per_host=args.max_per_host, retries=args.retries, timeout=args.timeout,
+                          manifest=DownloadManifest(args.manifest))
+
+
+def run(args, output_dir='pdfs', pdf_urls=None):
+    """
+    Downloads the PDFs of every event in args.urls into output_dir, or just the given pdf_urls if a crawl has
+    already found them, then writes missing_urls.txt.
+    """
+    engine = new_engine(args)
+    if pdf_urls is not None:
+        download_pdfs(pdf_urls, output_dir, engine)
+    else:
+        browsers = BrowserPool(size=args.browsers)
         try:
-            future.result()
-        except Exception as exc:
-            print(f'Thread error: {exc}')
+            with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+                futures = {}
+                for url in read_urls(args.urls):
+                    futures[executor.submit(download_pdfs_wrapper, url, engine, browsers, output_dir)] = url
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as exc:
+                        print(f'Thread error: {exc}')
+                        instrumentation.report.error('scrape_pdf_urls', futures[future], exc)
+        finally:
+            browsers.close()
+    write_missing_urls()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        with instrumentation.profiled(args.profile):
+            run(args)
+    finally:
+        instrumentation.report.write(args.report, args.slowest)
+
+
+def write_missing_urls(path='missing_urls.txt'):
+    with open(path, 'w') as file:
+        for filename in missing_urls:
+            file.write(filename + '\n')
+
 
-with open('missing_urls.txt', 'w') as file:
-    for filename in missing_urls:
-        file.write(filename + '\n')
+if __name__ == '__main__':
+    main()
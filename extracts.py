@@ -0,0 +1,104 @@
+"""
+Pre-aggregated extracts of the Results table for dashboards, maintained per season.
+
+Dashboards that aggregate the whole Results table on every load, joining it back to the dimension tables by ID,
+can read these small tables instead. They are denormalized, with names rather than IDs:
+
+    Medal Counts      results per season, section and club in each rank_bin, with the total
+    Participants      distinct competitors and results per season and category type
+    Category Points   average and best Points, and results, per season and category
+
+Each season's rows only depend on that season's results, so they are saved per season together with the PDFs they
+were built from and the season of each. A run recomputes just the seasons its new, changed or removed PDFs fall in,
+plus any season a PDF moved in or out of, and reuses the saved rows of the rest. The state is saved and checked as
+described in incremental.py.
+"""
+
+import pandas as pd
+
+import incremental
+
+EXTRACTS = ['Medal Counts', 'Participants', 'Category Points']
+
+
+def named_results(results_df, competition_df, category_df, clubs_df, section_df):
+    """The Results rows with the Season, Section, Club, Category_Name and Category_Type the extracts group by."""
+    return pd.DataFrame({
+        'Season': results_df['Competition_ID'].map(competition_df['Season']).fillna(''),
+        'Section': results_df['Section'].astype(object).map(section_df['Section']),
+        'Club': results_df['Club'].astype(object).map(clubs_df['Club_Name']),
+        'Category_Name': results_df['Category_ID'].map(category_df['Category_Name']),
+        'Category_Type': results_df['Category_ID'].map(category_df['Category_Type']),
+        'Competitor': results_df['Competitor'],
+        'Points': results_df['Points'].astype('float64'),
+        'rank_bin': results_df['rank_bin'],
+    })
+
+
+def medal_counts(named):
+    """One column per rank_bin, in rank order, and one row per season, section and club with any results."""
+    counts = named.groupby(['Season', 'Section', 'Club', 'rank_bin'], observed=True, dropna=False).size()
+    counts = counts.unstack('rank_bin', fill_value=0).reindex(columns=named['rank_bin'].cat.categories, fill_value=0)
+    counts.columns = list(counts.columns)
+    counts['Results'] = counts.sum(axis=1)
+    return counts[counts['Results'] > 0].reset_index()
+
+
+def participants(named):
+    return (named.groupby(['Season', 'Category_Type'], dropna=False)
+            .agg(Participants=('Competitor', 'nunique'), Results=('Competitor', 'size')).reset_index())
+
+
+def category_points(named):
+    points = (named.groupby(['Season', 'Category_Name', 'Category_Type'], dropna=False)
+              .agg(Average_Points=('Points', 'mean'), Best_Points=('Points', 'max'), Results=('Points', 'size')))
+    points[['Average_Points', 'Best_Points']] = points[['Average_Points', 'Best_Points']].round(2)
+    return points.reset_index()
+
+
+def season_extracts(named):
+    """{season: {sheet: DataFrame}} for every season in named."""
+    by_sheet = {'Medal Counts': medal_counts(named), 'Participants': participants(named),
+                'Category Points': category_points(named)}
+    return {season: {sheet: df[df['Season'] == season].reset_index(drop=True) for sheet, df in by_sheet.items()}
+            for season in named['Season'].unique()}
+
+
+def source_seasons(results_df, competition_df, sources):
+    """{PDF: season} for the (PDF, content hash, Results_ID of its first row, number of rows) sources."""
+    starts = [start for source, file_hash, start, n_rows in sources]
+    seasons = results_df['Competition_ID'].iloc[starts].map(competition_df['Season']).fillna('')
+    return dict(zip((source for source, file_hash, start, n_rows in sources), seasons))
+
+
+def build_extracts(results_df, sources, competition_df, category_df, clubs_df, section_df, state_file, fingerprint):
+    """
+    Brings the saved extracts up to date with results_df and returns them as {sheet name: DataFrame}, sorted by
+    season. sources lists (PDF, content hash, Results_ID of its first row, number of rows) for every PDF that
+    contributed results. Without a state_file every season is computed and nothing is saved.
+    """
+    state = incremental.load_state(state_file, fingerprint)
+    if state is None:
+        state = {'fingerprint': fingerprint, 'files': {}, 'seasons': {}}
+
+    seasons = source_seasons(results_df, competition_df, sources)
+    current = {source: (file_hash, seasons[source]) for source, file_hash, start, n_rows in sources}
+    touched = {season for source, (file_hash, season) in current.items() if state['files'].get(source) != (file_hash, season)}
+    touched |= {season for source, (file_hash, season) in state['files'].items() if current.get(source) != (file_hash, season)}
+
+    if touched:
+        all_seasons = results_df['Competition_ID'].map(competition_df['Season']).fillna('')
+        touched_rows = results_df[all_seasons.isin(touched).to_numpy()]
+        refreshed = season_extracts(named_results(touched_rows, competition_df, category_df, clubs_df, section_df))
+        for season in touched:
+            state['seasons'].pop(season, None)
+        state['seasons'].update(refreshed)
+    print(f"Extracts: {len(touched)} of {len(state['seasons'])} seasons refreshed")
+
+    state['files'] = current
+    if state_file:
+        pd.to_pickle(state, state_file)
+
+    ordered = sorted(state['seasons'])
+    return {sheet: pd.concat([state['seasons'][season][sheet] for season in ordered], ignore_index=True)
+            if ordered else pd.DataFrame() for sheet in EXTRACTS}
@@ -0,0 +1,291 @@
+#!/usr/bin/python3
+"""
+Proposes additions to the mapping CSVs by fuzzy matching the names they do not cover yet.
+
+The maps only normalize the spellings they list, so every other spelling of a club, competition or category, and
+every spelling of a competitor, becomes a row of its own. This matches those names against the known ones:
+
+- Every name is reduced to a key: lowercase words without punctuation, sorted for competitors so "Smith, Ann" and
+  "Ann Smith" share a key.
+- A blocking index maps each character trigram of the keys to the names that contain it. For competitors, whose
+  first and last names are each shared by many people, the blocking keys pair each word with the trigrams of the
+  others instead, so a name with one word misspelled still shares a small block with the right one. A name's
+  candidates are the names sharing the most blocking keys with it; keys shared by more than max_block names ("ska",
+  "ing") do not narrow anything down and are skipped. The work per name is bounded, so matching stays near-linear
+  in the number of names instead of scoring every pair.
+- Candidates are scored by the Dice coefficient of their trigrams, and a name that is the start of a candidate's
+  (the PDFs truncate long club names) scores at least PREFIX_SCORE. Names with different numbers in them, e.g. the
+  years of two competitions, never match, and neither do competitors unless each word of one is close to a word
+  of the other, so "Emma Young" and "Ava Young" stay apart.
+- The best candidate is proposed if it scores at least the threshold; the runner-up is listed to show ambiguity.
+
+Clubs, competitions and categories are matched against the Scraped and Normalized names of their map (and clubs.csv
+for clubs), using the unmapped names from the last processor run, <cache-dir>/unmapped_names.csv. There is no list of
+known competitors, so the competitor names in the parse cache, less the spellings competitor_mapping.csv already
+covers, are matched against each other and each spelling is proposed to map to the more frequent one. Proposals go
+to maps/<map file>.proposed.csv with the map's Scraped and Normalized columns plus Score, Count and Runner_Up, for
+review; accepted rows are copied into the map, which the processor applies on its next run. Nothing reads the
+proposed files.
+
+Usage: python fuzzy_match.py [--cache-dir cache] [--kinds club,competition,category,competitor] [--threshold 0.7]
+"""
+
+import argparse
+import collections
+import csv
+import difflib
+import os
+import re
+
+import processor
+
+KINDS = ['club', 'competition', 'category', 'competitor']
+PROPOSED_SUFFIX = '.proposed.csv'
+# Other known club spellings, Dataframe -> Normalized
+CLUBS_FILE = 'clubs.csv'
+
+# Lowest score proposed per kind. People's names are short, so one letter weighs more in their scores.
+THRESHOLDS = {'club': 0.6, 'competition': 0.6, 'category': 0.6, 'competitor': 0.75}
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_MAX_BLOCK = 500
+# Candidates scored per name, the ones sharing the most probed trigrams
+CANDIDATES = 10
+PREFIX_SCORE = 0.9
+# A name has to be at least this long to match as the start of a longer one
+MIN_PREFIX = 6
+# Competitor names scoring at least this are also compared word by word; lower scores fail any threshold worth using
+WORD_CHECK = 0.5
+
+NON_WORD = re.compile(r"[^\w\s]")
+NUMBER = re.compile(r"\d+")
+
+
+def name_key(name, sort_words=False):
+    """Lowercase words without punctuation, optionally sorted."""
+    words = NON_WORD.sub(' ', name.lower()).split()
+    return ' '.join(sorted(words) if sort_words else words)
+
+
+def trigrams(key):
+    padded = f' {key} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def word_similarity(key, candidate_key):
+    """How well every word of the name with fewer words matches a word of the other, as the worst difflib ratio."""
+    words, candidate_words = key.split(), candidate_key.split()
+    if len(words) > len(candidate_words):
+        words, candidate_words = candidate_words, words
+    return min((max(difflib.SequenceMatcher(None, word, other).ratio() for other in candidate_words) for word in words),
+               default=0.0)
+
+
+def similarity(key, grams, candidate_key, candidate_grams, by_word=False):
+    """
+    Dice coefficient of the trigrams. A key that starts candidate_key scores at least PREFIX_SCORE, higher the more
+    of it there is. Keys with different numbers score 0, and with by_word, so do keys whose words do not all match.
+    """
+    if NUMBER.findall(key) != NUMBER.findall(candidate_key):
+        return 0.0
+    score = 2 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams))
+    if len(key) >= MIN_PREFIX and candidate_key.startswith(key):
+        score = max(score, PREFIX_SCORE + (1 - PREFIX_SCORE) * score)
+    if by_word and score >= WORD_CHECK:
+        score = min(score, word_similarity(key, candidate_key))
+    return score
+
+
+class BlockingIndex:
+    """Names indexed by the trigrams of their keys, to find the likely matches of a name without scoring every pair."""
+
+    def __init__(self, names, people=False, max_block=DEFAULT_MAX_BLOCK):
+        """With people, the words of a name may come in any order and must each match."""
+        self.names = list(names)
+        self.sort_words = self.by_word = people
+        self.max_block = max_block
+        self.keys = [name_key(name, people) for name in self.names]
+        self.grams = [trigrams(key) for key in self.keys]
+        self.postings = collections.defaultdict(list)
+        for i, key in enumerate(self.keys):
+            for blocking_key in self.blocking_keys(key, self.grams[i]):
+                self.postings[blocking_key].append(i)
+        self.pairs_scored = 0
+
+    def blocking_keys(self, key, grams):
+        """
+        The trigrams of a key or, for people with more than one word, each word paired with the trigrams of the
+        others, "ann|smi". Those blocks stay small however many names share a trigram, and a name with one word
+        misspelled still shares a block with every word it has spelled right.
+        """
+        words = key.split()
+        if not self.by_word or len(words) < 2:
+            return grams
+        return {f"{word}|{gram}" for word in set(words) for gram in trigrams(' '.join(other for other in words if other != word))}
+
+    def candidates(self, key, grams):
+        """Positions of the names sharing the most blocking keys with a key, leaving out keys shared by too many."""
+        shared = collections.Counter()
+        for blocking_key in self.blocking_keys(key, grams):
+            block = self.postings.get(blocking_key)
+            if block and len(block) <= self.max_block:
+                shared.update(block)
+        return [i for i, _ in shared.most_common(CANDIDATES)]
+
+    def match(self, name, exclude=None):
+        """
+        Returns [(score, position)] of the candidates for name, best first. exclude is a position to leave out,
+        for matching a name against the index it is part of.
+        """
+        key = name_key(name, self.sort_words)
+        grams = trigrams(key)
+        scored = []
+        for i in self.candidates(key, grams):
+            if i != exclude:
+                scored.append((similarity(key, grams, self.keys[i], self.grams[i], self.by_word), i))
+        self.pairs_scored += len(scored)
+        scored.sort(key=lambda item: (-item[0], self.names[item[1]]))
+        return scored
+
+
+def propose(names, targets, threshold=DEFAULT_THRESHOLD, max_block=DEFAULT_MAX_BLOCK):
+    """
+    Matches each of names, a Counter of unmapped names, against targets, a dict of known name -> normalized name.
+    Returns (proposals, pairs scored); proposals are (scraped, normalized, score, count, runner-up) rows.
+
+    The maps only list Scraped spellings, so a name that already is a Normalized name falls through them too; those
+    are left out rather than proposed to map to themselves.
+    """
+    index = BlockingIndex(targets, max_block=max_block)
+    normalized_names = {normalized.strip().lower() for normalized in targets.values()}
+    proposals = []
+    for name, count in names.most_common():
+        if name.strip().lower() in normalized_names:
+            continue
+        matches = [(score, targets[index.names[i]]) for score, i in index.match(name) if score >= threshold]
+        if not matches:
+            continue
+        (score, normalized), runner_up = matches[0], [other for _, other in matches[1:] if other != matches[0][1]]
+        proposals.append((name, normalized, round(score, 3), count, runner_up[0] if runner_up else ''))
+    return proposals, index.pairs_scored
+
+
+def propose_merges(names, threshold=THRESHOLDS['competitor'], max_block=DEFAULT_MAX_BLOCK):
+    """
+    Matches the names in a Counter against each other, proposing to map each name to a similar, more frequent one
+    (the first alphabetically between equally frequent ones). Chains are followed, so every proposal points at a
+    name that is not itself proposed. Returns (proposals, pairs scored) like propose().
+    """
+    index = BlockingIndex(names, people=True, max_block=max_block)
+    best = {}
+    for position, name in enumerate(index.names):
+        matches = [(score, index.names[i]) for score, i in index.match(name, exclude=position) if score >= threshold]
+        preferred = [(score, other) for score, other in matches
+                     if (names[other], name) > (names[name], other)]
+        if preferred:
+            runner_up = [other for _, other in matches if other != preferred[0][1]]
+            best[name] = (preferred[0][1], round(preferred[0][0], 3), runner_up[0] if runner_up else '')
+
+    proposals = []
+    for name, (normalized, score, runner_up) in best.items():
+        seen = {name}
+        while normalized in best and normalized not in seen:
+            seen.add(normalized)
+            normalized = best[normalized][0]
+        proposals.append((name, normalized, score, names[name], runner_up))
+    proposals.sort(key=lambda row: (-row[3], row[0]))
+    return proposals, index.pairs_scored
+
+
+def load_unmapped(cache_dir):
+    """{map name: Counter of the names that fell through it} from the last processor run."""
+    path = os.path.join(cache_dir, 'unmapped_names.csv')
+    if not os.path.exists(path):
+        raise ValueError(f"No {path}, run the processor first")
+    unmapped = collections.defaultdict(collections.Counter)
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            unmapped[row['Map']][row['Scraped']] += int(row['Count'])
+    return unmapped
+
+
+def load_targets(kind, maps_dir=processor.MAPS_DIR):
+    """{known name: normalized name} from the kind's map, both columns, and clubs.csv for clubs."""
+    mapping = processor.load_mapping_from_csv(os.path.join(maps_dir, processor.MappingRegistry.NAME_MAPS[kind]))
+    if kind == 'club' and os.path.exists(CLUBS_FILE):
+        mapping.update(processor.load_mapping_from_csv(CLUBS_FILE))
+    targets = {normalized: normalized for normalized in mapping.values()}
+    targets.update(mapping)
+    return targets
+
+
+def competitor_names(cache_dir, maps_dir=processor.MAPS_DIR):
+    """
+    Counter of the competitor names in every cached parse, leaving out the spellings the competitor map already
+    covers, which a parse from before they were added still holds.
+    """
+    names = collections.Counter()
+    for parsed in processor.ParseCache.open_existing(cache_dir).cached_parses().values():
+        if parsed["results"] is not None and 'Competitor' in parsed["results"]:
+            names.update(parsed["results"]['Competitor'].dropna())
+    map_file = os.path.join(maps_dir, processor.MappingRegistry.NAME_MAPS['competitor'])
+    if os.path.exists(map_file):
+        mapped = {name.strip().lower() for name in processor.load_mapping_from_csv(map_file)}
+        names = collections.Counter({name: count for name, count in names.items() if name.strip().lower() not in mapped})
+    return names
+
+
+def write_proposals(path, proposals):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Scraped', 'Normalized', 'Score', 'Count', 'Runner_Up'])
+        writer.writerows(proposals)
+
+
+def run(args):
+    unmapped = None
+    for kind in args.kinds:
+        threshold = args.threshold if args.threshold is not None else THRESHOLDS[kind]
+        if kind == 'competitor':
+            names = competitor_names(args.cache_dir, args.maps_dir)
+            proposals, pairs_scored = propose_merges(names, threshold, args.max_block)
+        else:
+            unmapped = unmapped if unmapped is not None else load_unmapped(args.cache_dir)
+            names = unmapped[kind]
+            proposals, pairs_scored = propose(names, load_targets(kind, args.maps_dir), threshold, args.max_block)
+        map_file = processor.MappingRegistry.NAME_MAPS[kind]
+        path = os.path.join(args.maps_dir, map_file[:-len('.csv')] + PROPOSED_SUFFIX)
+        write_proposals(path, proposals)
+        print(f"{kind}: {len(proposals)} proposals for {len(names)} names ({pairs_scored} pairs scored), written to {path}")
+
+
+def kinds(value):
+    """argparse type for --kinds: a comma separated list of KINDS."""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in KINDS]
+    if unknown or not names:
+        raise argparse.ArgumentTypeError(f"unknown kind(s) {', '.join(unknown)}; choose from {', '.join(KINDS)}")
+    return names
+
+
+def build_arg_parser(add_help=True):
+    arg_parser = argparse.ArgumentParser(description="Propose mapping CSV additions for the unmapped names by fuzzy matching.",
+                                         add_help=add_help)
+    arg_parser.add_argument('--cache-dir', default=processor.CACHE_DIR,
+                            help=f"Parse cache holding unmapped_names.csv and the competitor names (default: {processor.CACHE_DIR})")
+    arg_parser.add_argument('--maps-dir', default=processor.MAPS_DIR,
+                            help=f"Directory of the mapping CSVs, where the proposals are written (default: {processor.MAPS_DIR})")
+    arg_parser.add_argument('--kinds', type=kinds, default=KINDS,
+                            help=f"Comma separated names to match from {', '.join(KINDS)} (default: all)")
+    arg_parser.add_argument('--threshold', type=float,
+                            help="Lowest score proposed, from 0 to 1 (default: " + ', '.join(f"{kind} {threshold}" for kind, threshold in THRESHOLDS.items()) + ")")
+    arg_parser.add_argument('--max-block', type=int, default=DEFAULT_MAX_BLOCK,
+                            help=f"Trigrams shared by more names than this are not used to find candidates (default: {DEFAULT_MAX_BLOCK})")
+    return arg_parser
+
+
+def main(argv=None):
+    run(build_arg_parser().parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/python3
+"""
+Competition history of every competitor, for progression lookups.
+
+The index maps each competitor to their results: the competition, the category and its program type, the rank and
+the Points. Asking for one skater's history, their progression, their season-over-season deltas or a head-to-head
+comparison reads only that skater's rows, instead of scanning the whole Results table and joining it to the
+dimension tables.
+
+A competition's start date and season come from whichever of its PDFs is read first, so a new PDF can change them
+for the competition's other PDFs too. The rows therefore hold only the competition's name, and each run saves the
+date and season of every competition with the index, for the queries to read. A run adds the results of new PDFs,
+drops those of PDFs that disappeared and reads those of changed PDFs again, touching only the competitors of those
+PDFs. The state is saved and checked as described in incremental.py. Queries take a competitor's name, or their
+Competitor ID in the outputs of the run that last saved the index.
+
+The processor keeps the index in <cache-dir>/history.pkl. From the command line:
+
+    python history.py "Ann Smith"                          every result, oldest first
+    python history.py "Ann Smith" --view progression       with the change since the previous result
+    python history.py "Ann Smith" --view seasons           best and average Points per season, and their change
+    python history.py "Ann Smith" --vs "Beth Jones"        the events both skated
+
+Usage: python history.py COMPETITOR [--vs OPPONENT] [--view history|progression|seasons] [--program-type TYPE]
+"""
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+import incremental
+
+STATE_FILE = 'history.pkl'
+# Bump this whenever the layout of the saved index changes, so an index saved by an older layout is rebuilt
+STATE_VERSION = 2
+ROW_FIELDS = ['Competition', 'Category', 'Program_Type', 'Rank', 'Points', 'Source', 'Row']
+HISTORY_COLUMNS = ['Date', 'Season', 'Competition', 'Category', 'Program_Type', 'Rank', 'Points']
+
+
+def name_batch(results_df, sources, competition_df, category_df, program_type_df, competitor_df):
+    """
+    The results of the given (PDF, Results_ID of its first row, number of rows) sources as ROW_FIELDS columns plus
+    Competitor, with names instead of IDs.
+    """
+    batch = incremental.source_rows(results_df, sources, ['Competitor', 'Competition_ID', 'Category_ID', 'Rank', 'Points'])
+    batch['Competitor'] = batch['Competitor'].astype(object).map(incremental.names_by_id(competitor_df['Competitor_Name']))
+    batch['Competition'] = batch['Competition_ID'].map(competition_df['Competition_Name'])
+    batch['Program_Type'] = batch['Category_ID'].map(category_df['Program_Type']).map(program_type_df['Program_Type'])
+    batch['Category'] = batch['Category_ID'].map(category_df['Category_Name'])
+    batch['Rank'] = batch['Rank'].astype(int)
+    batch['Points'] = batch['Points'].astype(float).round(2)
+    return batch.dropna(subset=['Competitor'])[['Competitor'] + ROW_FIELDS]
+
+
+class HistoryIndex:
+    """
+    {competitor name: [row tuples in ROW_FIELDS order]}, with the PDFs they were read from and the competitors of
+    each, and {competition name: (start as "YYYY-MM", season)} as of the last update.
+    """
+
+    def __init__(self, fingerprint, files=None, competitors=None, rows=None, competitions=None, competitor_names=None,
+                 version=STATE_VERSION):
+        self.fingerprint = fingerprint
+        # PDF -> content hash, and PDF -> the names of the competitors in its results
+        self.files = files if files is not None else {}
+        self.competitors = competitors if competitors is not None else {}
+        self.rows = rows if rows is not None else {}
+        self.competitions = competitions if competitions is not None else {}
+        # Competitor ID -> name, as of the last update
+        self.competitor_names = competitor_names if competitor_names is not None else []
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            raise ValueError(f"No competitor history in {path}, run the processor or the export command first")
+        state = pd.read_pickle(path)
+        if state.get('version', 1) != STATE_VERSION:
+            raise ValueError(f"The competitor history in {path} was saved by an older version, run the processor or "
+                             f"the export command again")
+        return cls(**state)
+
+    def save(self, path):
+        pd.to_pickle({'version': STATE_VERSION, 'fingerprint': self.fingerprint, 'files': self.files, 'competitors': self.competitors,
+                      'rows': self.rows, 'competitions': self.competitions,
+                      'competitor_names': self.competitor_names}, path)
+
+    def add(self, batch):
+        """Adds a name_batch() of new results and returns the number of competitors whose history changed."""
+        touched = set()
+        for competitor, *row in batch.itertuples(index=False, name=None):
+            self.rows.setdefault(competitor, []).append(tuple(row))
+            self.competitors.setdefault(row[5], set()).add(competitor)
+            touched.add(competitor)
+        return len(touched)
+
+    def remove(self, sources):
+        """Removes the results read from the given PDFs and returns the number of competitors whose history changed."""
+        sources = set(sources)
+        touched = set()
+        for source in sources:
+            touched.update(self.competitors.pop(source, ()))
+            self.files.pop(source, None)
+        for competitor in touched:
+            kept = [row for row in self.rows[competitor] if row[5] not in sources]
+            if kept:
+                self.rows[competitor] = kept
+            else:
+                del self.rows[competitor]
+        return len(touched)
+
+    def name(self, competitor):
+        """A competitor's name, given the name or their Competitor ID."""
+        if isinstance(competitor, str):
+            return competitor
+        if 0 <= competitor < len(self.competitor_names):
+            return self.competitor_names[competitor]
+        raise ValueError(f"No competitor with ID {competitor}")
+
+    def dated(self, df):
+        """Adds the Date and Season of each row's competition and sorts the rows by date, then by PDF and row."""
+        df.insert(0, 'Date', [self.competitions.get(name, ('', None))[0] for name in df['Competition']])
+        df.insert(1, 'Season', [self.competitions.get(name, ('', None))[1] for name in df['Competition']])
+        df = df.sort_values(['Date', 'Competition', 'Category', 'Source', 'Row'], kind='stable')
+        return df.drop(columns=['Source', 'Row']).reset_index(drop=True)
+
+    def history(self, competitor):
+        """Every result of a competitor, oldest first, as a DataFrame of HISTORY_COLUMNS."""
+        return self.dated(pd.DataFrame(self.rows.get(self.name(competitor), []), columns=ROW_FIELDS))
+
+    def progression(self, competitor, program_type=None):
+        """
+        A competitor's results, oldest first, with the Points change since their previous result in the same
+        program type and their best Points in it so far. program_type limits it to one program type.
+        """
+        df = self.history(competitor)
+        if program_type is not None:
+            df = df[df['Program_Type'] == program_type].reset_index(drop=True)
+        by_program = df.groupby('Program_Type', sort=False)['Points']
+        df['Change'] = by_program.diff().round(2)
+        df['Best_So_Far'] = by_program.cummax()
+        return df
+
+    def season_deltas(self, competitor):
+        """
+        Per season and program type: the number of results, the best and average Points, and the change in best
+        Points since the competitor's previous season in that program type.
+        """
+        df = self.history(competitor)
+        seasons = (df.groupby(['Program_Type', 'Season'])
+                   .agg(Results=('Points', 'size'), Best_Points=('Points', 'max'), Average_Points=('Points', 'mean'))
+                   .reset_index())
+        seasons['Average_Points'] = seasons['Average_Points'].round(2)
+        seasons['Best_Change'] = seasons.groupby('Program_Type')['Best_Points'].diff().round(2)
+        return seasons
+
+    def head_to_head(self, competitor, opponent):
+        """
+        The events (competition and category) both competitors skated, oldest first, with each one's rank and
+        Points and who placed higher.
+        """
+        first, second = self.name(competitor), self.name(opponent)
+        events = {(row[0], row[1]): row for row in self.rows.get(first, [])}
+        rows = []
+        for row in self.rows.get(second, []):
+            mine = events.get((row[0], row[1]))
+            if mine is not None:
+                winner = first if mine[3] < row[3] else second if row[3] < mine[3] else ''
+                rows.append(row[:3] + (mine[3], mine[4], row[3], row[4], winner) + row[5:])
+        columns = ['Competition', 'Category', 'Program_Type', f'{first} Rank', f'{first} Points', f'{second} Rank',
+                   f'{second} Points', 'Higher', 'Source', 'Row']
+        return self.dated(pd.DataFrame(rows, columns=columns))
+
+
+def build_history(results_df, sources, keys_frames, competition_dates, program_type_df, state_file, fingerprint):
+    """
+    Brings the saved history index up to date with new, changed and removed PDFs, saves it and returns it.
+
+    sources lists (PDF, content hash, Results_ID of its first row, number of rows) for every PDF that contributed
+    results. keys_frames are the competition, category and competitor tables, and competition_dates holds each
+    competition's start as "YYYY-MM".
+    """
+    competition_df, category_df, competitor_df = keys_frames
+    state = incremental.load_state(state_file, fingerprint, STATE_VERSION)
+    index = HistoryIndex(**state) if state is not None else HistoryIndex(fingerprint)
+
+    current_files = {source: file_hash for source, file_hash, start, n_rows in sources}
+    # The rows of PDFs that changed or disappeared are dropped, and those that changed are read again
+    stale = incremental.stale_sources(index.files, current_files)
+    changed = index.remove(stale)
+    new_sources = [(source, start, n_rows) for source, file_hash, start, n_rows in sources if source not in index.files]
+    batch = name_batch(results_df, new_sources, competition_df, category_df, program_type_df, competitor_df)
+    changed += index.add(batch)
+    print(f"History: {len(batch)} new results from {len(new_sources)} PDFs, {len(stale)} changed or removed PDFs dropped, "
+          f"{changed} updates over {len(index.rows)} competitors")
+
+    index.files.update({source: current_files[source] for source, start, n_rows in new_sources})
+    index.competitions = dict(zip(competition_df['Competition_Name'], zip(competition_dates, competition_df['Season'])))
+    index.competitor_names = competitor_df['Competitor_Name'].tolist()
+    index.save(state_file)
+    return index
+
+
+def competitor(value):
+    """argparse type for a competitor: a Competitor ID when it is a number, otherwise a name."""
+    return int(value) if value.isdigit() else value
+
+
+def run(args):
+    index = HistoryIndex.load(os.path.join(args.cache_dir, STATE_FILE))
+    if args.view == 'progression' and args.vs is None:
+        df = index.progression(args.competitor, args.program_type)
+    else:
+        df = (index.head_to_head(args.competitor, args.vs) if args.vs is not None else
+              index.history(args.competitor) if args.view == 'history' else index.season_deltas(args.competitor))
+        if args.program_type is not None:
+            df = df[df['Program_Type'] == args.program_type]
+    if df.empty:
+        print(f"No results for {index.name(args.competitor)}" + (f" against {index.name(args.vs)}" if args.vs is not None else ''))
+    else:
+        print(df.to_string(index=False))
+
+
+def build_arg_parser(add_help=True):
+    import processor
+
+    arg_parser = argparse.ArgumentParser(description="Show a competitor's results, progression or head-to-head record.",
+                                         add_help=add_help)
+    arg_parser.add_argument('competitor', type=competitor, help="Competitor name, or Competitor ID")
+    arg_parser.add_argument('--vs', type=competitor, metavar='OPPONENT',
+                            help="Show the events both competitors skated instead, with each one's rank and Points")
+    arg_parser.add_argument('--view', choices=['history', 'progression', 'seasons'], default='history',
+                            help="Every result, every result with its change since the previous one, or per season (default: history)")
+    arg_parser.add_argument('--program-type', help="Only results of this program type, e.g. \"Free Program\"")
+    arg_parser.add_argument('--cache-dir', default=processor.CACHE_DIR,
+                            help=f"Parse cache holding {STATE_FILE} (default: {processor.CACHE_DIR})")
+    return arg_parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    try:
+        run(args)
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+if __name__ == '__main__':
+    main()
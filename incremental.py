@@ -0,0 +1,51 @@
+"""
+Helpers shared by the tables kept up to date across runs: the records, the dashboard extracts and the competitor
+history.
+
+Each saves a state file in the cache directory together with the PDFs it was built from and their content hashes,
+so a run only reads the results of new PDFs and handles those of changed or removed ones. The state refers to
+results by name and by (PDF, row within the PDF's results) rather than by surrogate ID, so it stays valid when new
+PDFs shift the IDs, and it is discarded when the parse cache fingerprint (parser version, table backend, mapping
+CSVs) it was saved under no longer matches.
+"""
+
+import os
+
+import pandas as pd
+
+
+def load_state(state_file, fingerprint, version=1):
+    """
+    The state saved in state_file, or None if there is none, or it was saved under another fingerprint or by another
+    version of the state's layout. A state saved without a version is version 1.
+    """
+    if not state_file or not os.path.exists(state_file):
+        return None
+    state = pd.read_pickle(state_file)
+    return state if state['fingerprint'] == fingerprint and state.get('version', 1) == version else None
+
+
+def stale_sources(saved_files, current_files):
+    """The PDFs of saved_files, {PDF: content hash}, that changed or are gone from current_files."""
+    return [source for source, file_hash in saved_files.items() if current_files.get(source) != file_hash]
+
+
+def source_rows(results_df, sources, columns):
+    """
+    The given columns of the results of (PDF, Results_ID of its first row, number of rows) sources, plus the Source
+    PDF and the Row within its results.
+    """
+    chunks = []
+    for source, start, n_rows in sources:
+        chunk = results_df.iloc[start:start + n_rows][columns].copy()
+        chunk['Source'] = source
+        chunk['Row'] = range(n_rows)
+        chunks.append(chunk)
+    if not chunks:
+        return pd.DataFrame(columns=columns + ['Source', 'Row'])
+    return pd.concat(chunks)
+
+
+def names_by_id(names):
+    """Series of ID -> name given the names in ID order, to map a column of surrogate IDs to names."""
+    return pd.Series(list(names), dtype=object)
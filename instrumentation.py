@@ -0,0 +1,154 @@
+"""
+Run instrumentation for the downloader, the processor and the pipeline.
+
+Every stage worth watching is timed into the module-level `report`, per file (or URL) where the stage works on one,
+and failures are kept as structured records instead of only lines in error.log. At the end of a run the report is
+written as JSON with, for every stage, the count, total and p50/p95/max latency, the slowest files and the errors.
+
+parse_file() runs in worker processes, whose `report` the main process never sees, so it times its stages with a
+FileTimer and returns the timings with its result; the main process adds them with report.add_file().
+"""
+
+import contextlib
+import cProfile
+import json
+import math
+import os
+import threading
+import time
+
+SLOWEST_FILES = 10
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    values = sorted(values)
+    rank = max(math.ceil(q / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class FileTimer:
+    """Seconds spent in each stage of the work on one file, as {stage: seconds}."""
+
+    def __init__(self):
+        self.timings = {}
+        self.current = None
+
+    @contextlib.contextmanager
+    def __call__(self, stage):
+        # current is left set if the stage raises, so the caller can tell which stage failed
+        self.current = stage
+        started = time.perf_counter()
+        yield
+        self.timings[stage] = self.timings.get(stage, 0) + time.perf_counter() - started
+        self.current = None
+
+
+class RunReport:
+    """Timings and errors collected over one run. Safe to use from several threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.clock = time.perf_counter()
+        self.timings = {}
+        self.errors = []
+
+    def add(self, stage, seconds, item=None):
+        with self.lock:
+            self.timings.setdefault(stage, []).append((item, seconds))
+
+    def add_file(self, item, timings):
+        """Adds the {stage: seconds} a FileTimer measured for one file."""
+        for stage, seconds in (timings or {}).items():
+            self.add(stage, seconds, item)
+
+    @contextlib.contextmanager
+    def stage(self, name, item=None):
+        """Times the block as one occurrence of a stage, whether or not it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started, item)
+
+    def error(self, stage, item, error):
+        record = {'stage': stage, 'file': item, 'error': str(error)}
+        if isinstance(error, BaseException):
+            record['type'] = type(error).__name__
+        with self.lock:
+            self.errors.append(record)
+
+    def stage_summary(self):
+        summary = {}
+        for stage, entries in self.timings.items():
+            seconds = [entry[1] for entry in entries]
+            summary[stage] = {
+                'count': len(seconds),
+                'total': round(sum(seconds), 4),
+                'p50': round(percentile(seconds, 50), 4),
+                'p95': round(percentile(seconds, 95), 4),
+                'max': round(max(seconds), 4),
+            }
+        return summary
+
+    def slowest_files(self, n=SLOWEST_FILES):
+        """The n files with the most time across all stages, with the time per stage."""
+        files = {}
+        for stage, entries in self.timings.items():
+            for item, seconds in entries:
+                if item is not None:
+                    stages = files.setdefault(item, {})
+                    stages[stage] = stages.get(stage, 0) + seconds
+        ranked = sorted(files.items(), key=lambda file: sum(file[1].values()), reverse=True)[:n]
+        return [{'file': item, 'seconds': round(sum(stages.values()), 4),
+                 'stages': {stage: round(seconds, 4) for stage, seconds in stages.items()}} for item, stages in ranked]
+
+    def to_dict(self, slowest=SLOWEST_FILES):
+        with self.lock:
+            return {
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'wall_seconds': round(time.perf_counter() - self.clock, 4),
+                'stages': self.stage_summary(),
+                'slowest_files': self.slowest_files(slowest),
+                'errors': list(self.errors),
+            }
+
+    def write(self, path, slowest=SLOWEST_FILES):
+        data = self.to_dict(slowest)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=1)
+        print(f"Run report: {len(data['stages'])} stages, {len(data['errors'])} errors, {data['wall_seconds']:.1f}s, written to {path}")
+        for stage, stats in sorted(data['stages'].items(), key=lambda item: item[1]['total'], reverse=True)[:5]:
+            print(f"  {stage:<24}{stats['count']:>7} x  {stats['total']:>9.2f}s  p50 {stats['p50']:.3f}s  p95 {stats['p95']:.3f}s")
+
+
+report = RunReport()
+
+
+@contextlib.contextmanager
+def profiled(path):
+    """Runs the block under cProfile and dumps the stats to path, for pstats or snakeviz. Does nothing without a path."""
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Wrote cProfile stats to {path}")
+
+
+def add_arguments(arg_parser, default_report=None, default_description=None):
+    arg_parser.add_argument('--report', default=default_report,
+                            help=f"Where to write the JSON run report (default: {default_description or default_report})")
+    arg_parser.add_argument('--slowest', type=int, default=SLOWEST_FILES,
+                            help=f"Number of slowest files listed in the run report (default: {SLOWEST_FILES})")
+    arg_parser.add_argument('--profile', metavar='PATH',
+                            help="Profile the main thread with cProfile and write the stats to PATH (worker threads and processes are not profiled)")
+    return arg_parser
@@ -0,0 +1,277 @@
+"""
+Crawls, downloads and parses the Skate AB results in one run, as a streaming pipeline:
+
+    event URLs -> scrape -> PDF URLs -> download -> PDFs -> validate and parse -> reduce and output
+
+Every stage runs concurrently with the others, with its own number of workers, and the stages are joined by
+bounded queues. When parsing falls behind, the queue in front of it fills up and the downloaders block on it,
+and then the scrapers do, so memory stays bounded while the PDFs of the first events are parsed as the later
+events are still being crawled. The wall time approaches that of the slowest stage rather than the sum of all.
+
+The reduce stage is the processor's: once every PDF has been parsed, the tables, records and outputs are built
+exactly as `processor.py` builds them from the same PDF directory.
+"""
+
+import argparse
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import downloader
+import instrumentation
+import processor
+
+# Put on a queue by a stage that will not produce anything more
+DONE = object()
+# The parse workers start while the scrape and download threads are running. A forked worker could inherit a lock
+# one of them holds (stdout, the run report, a connection pool) and deadlock on it, so workers come from a
+# forkserver, or are spawned where there is none.
+WORKER_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class Stage:
+    """
+    A pool of threads taking items from inbox and putting every item work(item) yields on outbox.
+
+    Once DONE arrives and every thread has finished, the stage puts DONE on outbox for the next stage.
+    """
+
+    def __init__(self, name, work, inbox, outbox, workers):
+        self.name = name
+        self.work = work
+        self.inbox = inbox
+        self.outbox = outbox
+        self.threads = [threading.Thread(target=self._run, name=f'{name}-{i}', daemon=True) for i in range(max(workers, 1))]
+        self.running = len(self.threads)
+        self.processed = 0
+        self.produced = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is DONE:
+                # Hand the marker on to the stage's other threads
+                self.inbox.put(DONE)
+                break
+            try:
+                for result in self.work(item):
+                    self.outbox.put(result)
+                    with self.lock:
+                        self.produced += 1
+                with self.lock:
+                    self.processed += 1
+            except Exception as exc:
+                print(f'{self.name} failed for {item}: {exc}')
+                instrumentation.report.error(self.name, item, exc)
+                with self.lock:
+                    self.failed += 1
+
+        with self.lock:
+            self.running -= 1
+            last = self.running == 0
+        if last:
+            self.outbox.put(DONE)
+
+    def summary(self):
+        return f'{self.name}: {self.processed} in, {self.produced} out, {self.failed} failed'
+
+
+class ParseStage:
+    """
+    Validates and parses the PDFs arriving on inbox. A PDF whose content is already in the parse cache is not
+    parsed again; the rest are parsed on a pool of worker processes, with at most two PDFs per worker in flight
+    so the stage applies backpressure to the downloads instead of queueing them all in the pool.
+
+    When the downloads are done, the PDFs already in pdf_dir that no event linked to this run are added as
+    well, so the result covers the same files `processor.py` would read.
+    """
+
+    def __init__(self, inbox, cache, pdf_dir, workers=1, table_backend='tabula', tabula_mode='jvm'):
+        self.inbox = inbox
+        self.cache = cache
+        self.pdf_dir = pdf_dir
+        self.workers = workers
+        processor.check_tabula_mode(table_backend, tabula_mode)
+        self.parse = functools.partial(processor.parse_file, table_backend=table_backend, tabula_mode=tabula_mode)
+        self.parsed_files = {}
+        self.seen = set()
+        self.cached = 0
+        self.parsed = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+        self.in_flight = threading.BoundedSemaphore(2 * max(workers, 1))
+        self.thread = threading.Thread(target=self._run, name='parse', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def join(self):
+        self.thread.join()
+        return self.parsed_files
+
+    def _run(self):
+        executor = (concurrent.futures.ProcessPoolExecutor(max_workers=self.workers,
+                                                           mp_context=multiprocessing.get_context(WORKER_START_METHOD))
+                    if self.workers > 1 else None)
+        try:
+            while True:
+                pdf_file = self.inbox.get()
+                if pdf_file is DONE:
+                    break
+                self._submit(pdf_file, executor)
+            for pdf_file in processor.list_pdf_files(self.pdf_dir):
+                self._submit(pdf_file, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+    def _submit(self, pdf_file, executor):
+        with self.lock, instrumentation.report.stage('cache_lookup', pdf_file):
+            content_hash = self.cache.file_hash(pdf_file)
+            # A URL seen twice, or a PDF the server reported unchanged, must not be parsed twice
+            if (pdf_file, content_hash) in self.seen:
+                return
+            self.seen.add((pdf_file, content_hash))
+            parsed = self.cache.get(pdf_file)
+        if parsed is not None:
+            self._store(pdf_file, content_hash, parsed, cached=True)
+        elif executor is None:
+            self._store(pdf_file, content_hash, self.parse(pdf_file))
+        else:
+            self.in_flight.acquire()
+            future = executor.submit(self.parse, pdf_file)
+            future.add_done_callback(functools.partial(self._done, pdf_file, content_hash))
+
+    def _done(self, pdf_file, content_hash, future):
+        self.in_flight.release()
+        try:
+            self._store(pdf_file, content_hash, future.result())
+        except Exception as exc:
+            print(f'parse failed for {pdf_file}: {exc}')
+            instrumentation.report.error('parse', pdf_file, exc)
+            with self.lock:
+                self.failed += 1
+
+    def _store(self, pdf_file, content_hash, parsed, cached=False):
+        with self.lock:
+            if not cached:
+                processor.report_parse(pdf_file, parsed)
+                self.cache.put(pdf_file, parsed)
+                self.parsed += 1
+            else:
+                self.cached += 1
+            # A file replaced by a newer download while its old content was being parsed keeps the newer parse
+            if self.cache.files[pdf_file]['hash'] == content_hash:
+                self.parsed_files[pdf_file] = parsed
+
+    def summary(self):
+        return f'parse: {self.parsed} parsed, {self.cached} from cache, {self.failed} failed'
+
+
+def run(args):
+    """Runs the whole pipeline and returns the parsed files, with the parse cache that holds them."""
+    os.makedirs(args.pdf_dir, exist_ok=True)
+    engine = downloader.new_engine(args)
+    browsers = downloader.BrowserPool(size=args.browsers)
+    cache = processor.ParseCache(args.cache_dir, rebuild=args.rebuild, table_backend=args.table_backend)
+
+    seen_urls = set()
+    seen_lock = threading.Lock()
+
+    def scrape(event_url):
+        for pdf_url in downloader.scrape_pdf_urls(event_url, engine.session, browsers):
+            with seen_lock:
+                if pdf_url in seen_urls:
+                    continue
+                seen_urls.add(pdf_url)
+            yield pdf_url
+
+    def download(pdf_url):
+        path, status = engine.fetch(pdf_url, args.pdf_dir)
+        if status == 'missing':
+            print(f'Skipping file {pdf_url} as it does not exist on the server.')
+            downloader.missing_urls.append(pdf_url)
+            return
+        if status == 'downloaded':
+            print(f'Saved file {os.path.basename(path)} to {args.pdf_dir}')
+        # Like processor.py, only names ending in .pdf are read. A copy saved under a name that lost its "?" is
+        # replaced on disk when the .pdf name arrives.
+        if path.endswith('.pdf'):
+            yield path
+
+    event_urls = queue.Queue()
+    pdf_urls = queue.Queue(maxsize=args.queue_size)
+    pdf_files = queue.Queue(maxsize=args.queue_size)
+    for event_url in downloader.read_urls(args.urls):
+        if event_url:
+            event_urls.put(event_url)
+    event_urls.put(DONE)
+
+    started = time.perf_counter()
+    stages = [
+        Stage('scrape', scrape, event_urls, pdf_urls, args.scrape_workers).start(),
+        Stage('download', download, pdf_urls, pdf_files, args.download_workers).start(),
+    ]
+    parse_stage = ParseStage(pdf_files, cache, args.pdf_dir, workers=args.workers, table_backend=args.table_backend,
+                             tabula_mode=args.tabula_mode).start()
+    try:
+        for stage in stages:
+            stage.join()
+        parsed_files = parse_stage.join()
+    finally:
+        browsers.close()
+        engine.manifest.save()
+
+    downloader.write_missing_urls()
+    cache.save(sorted(parsed_files))
+    for stage in stages + [parse_stage]:
+        print(stage.summary())
+    print(f'Crawled, downloaded and parsed {len(parsed_files)} PDFs in {time.perf_counter() - started:.1f}s')
+    return parsed_files, cache
+
+
+def parse_args(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Crawl the events in urls.txt, download their results PDFs and parse them into the Skate AB "
+                    "project tables as one streaming pipeline.",
+        parents=[downloader.build_arg_parser(add_help=False), processor.build_arg_parser(add_help=False)])
+    arg_parser.add_argument('--scrape-workers', type=int, default=4, help="Event pages scraped at once (default: 4)")
+    arg_parser.add_argument('--download-workers', type=int, default=8,
+                            help="PDFs downloaded at once, still subject to --max-per-host (default: 8)")
+    arg_parser.add_argument('--queue-size', type=int, default=64,
+                            help="Most items waiting between two stages before the earlier stage blocks (default: 64)")
+    instrumentation.add_arguments(arg_parser, default_description="<cache-dir>/run_report.json")
+    return arg_parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    processor.configure_logging()
+    try:
+        with instrumentation.profiled(args.profile):
+            with instrumentation.report.stage('crawl_and_parse'):
+                parsed_files, cache = run(args)
+            processor.write_outputs(parsed_files, cache, args)
+    finally:
+        instrumentation.report.write(args.report or os.path.join(args.cache_dir, 'run_report.json'), args.slowest)
+
+
+# The guard keeps the parse workers from re-running main() on platforms that spawn rather than fork
+if __name__ == '__main__':
+    main()
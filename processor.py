@@ -1,23 +1,46 @@
 #!/usr/bin/python3
 
 import concurrent.futures
+import functools
 import pandas as pd
-import pdfplumber
-import tabula
-import magic
+import numpy as np
 import re
+import calendar
 import csv
 from dateutil import parser
 from datetime import datetime
 import os
+import shutil
+import hashlib
+import json
+import argparse
 import logging
+import instrumentation
+import sinks
+import records
+import extracts
+import catalog
+import history
+from collections import Counter
+
+# pdfplumber, tabula and magic are imported by the functions that use them, so importing this module, e.g. to
+# export from the parse cache, does not load them.
+
+
+def configure_logging():
+    logging.basicConfig(filename='error.log', level=logging.ERROR)  # Specify log file and log level
 
 
-logging.basicConfig(filename='error.log', level=logging.ERROR)  # Specify log file and log level
 # List to store invalid PDF files
 invalid_files = []
 unable_to_scan = []
 
+# Bump this whenever a change to the parsing code alters what competition_details() or parse_pdf() return,
+# so the parse cache is rebuilt.
+PARSER_VERSION = 7
+CACHE_DIR = "cache"
+MAPS_DIR = "maps"
+
 # Some files are missing on the Skate AB page and do not propery give a 404 or other error page, but present a file to be downloaded.
 def is_pdf(file):
     """
@@ -29,16 +52,14 @@ def is_pdf(file):
     Returns:
         - bool: True if the file is a valid PDF, False otherwise.
     """
+    import magic
+
     # Create a magic object to detect the MIME type of the file
     mime = magic.Magic(mime=True)
     # Get the MIME type of the file
     file_type = mime.from_file(file)
     # Compare the MIME type with 'application/pdf' to check if it's a PDF file
-    if file_type != 'application/pdf':
-        # If it's not a PDF, append the file to the list of invalid files
-        invalid_files.append(file)
-        return False
-    return True
+    return file_type == 'application/pdf'
 
 
 
@@ -54,11 +75,8 @@ def load_mapping_from_csv(file_path):
     return mapping
 
 def normalize_name(name, mapping):
-    """Normalize name based on mapping."""
-    lower_name = name.strip().lower()  # Convert to lowercase
-    mapping = {k.lower(): v for k, v in mapping.items()}  # Convert keys to lowercase
-    normalized_name = mapping.get(lower_name, name)
-    return normalized_name
+    """Normalize name based on a mapping whose keys are already lowercased."""
+    return mapping.get(name.strip().lower(), name)
 
 def load_date_edge_cases(file_path):
     """Load date edge cases from CSV file to a dictionary."""
@@ -68,119 +86,237 @@ def load_date_edge_cases(file_path):
         date_edge_cases = {row['Edge Case']: row['Real Date'] for row in reader}
     return date_edge_cases
 
+class MappingRegistry:
+    """
+    The maps/*.csv lookups, loaded once per process and reloaded only when a CSV's mtime changes.
+
+    Name mappings are held with lowercased keys so lookups are case-insensitive, and the date edge cases are
+    compiled into a single regular expression. Every lookup is counted: hits per map, and the scraped names that
+    fell through unmapped, so the mapping CSVs can be extended where they are missing entries.
+
+    Worker processes each hold their own registry; parse_file() hands its counts back with take_stats() and
+    the main process adds them up with add_stats().
+
+    Competitor names are not counted as misses: there is no list of known competitors, so nearly every name would
+    be one. fuzzy_match.py matches them against each other in the parse cache instead.
+    """
+
+    NAME_MAPS = {
+        'competition': 'comp_map.csv',
+        'category': 'category_mapping.csv',
+        'club': 'club_mapping.csv',
+        'competitor': 'competitor_mapping.csv',
+    }
+    UNCOUNTED_MISSES = {'competitor'}
+    DATE_EDGE_CASES = 'date_edge_cases.csv'
+
+    def __init__(self, maps_dir=MAPS_DIR):
+        self.maps_dir = maps_dir
+        self._loaded = {}
+        self.hits = Counter()
+        self.misses = {map_name: Counter() for map_name in self.NAME_MAPS if map_name not in self.UNCOUNTED_MISSES}
+
+    def _load(self, file_name, loader):
+        path = os.path.join(self.maps_dir, file_name)
+        mtime = os.path.getmtime(path)
+        loaded = self._loaded.get(file_name)
+        if loaded is None or loaded[0] != mtime:
+            loaded = (mtime, loader(path))
+            self._loaded[file_name] = loaded
+        return loaded[1]
+
+    def name_map(self, map_name):
+        """Returns the named mapping with lowercased keys."""
+        return self._load(self.NAME_MAPS[map_name],
+                          lambda path: {k.lower(): v for k, v in load_mapping_from_csv(path).items()})
+
+    def normalize(self, map_name, name):
+        """Normalizes a single scraped name, leaving it untouched if the map has no entry for it."""
+        mapping = self.name_map(map_name)
+        if name.strip().lower() in mapping:
+            self.hits[map_name] += 1
+        elif map_name in self.misses:
+            self.misses[map_name][name] += 1
+        return normalize_name(name, mapping)
+
+    def normalize_series(self, map_name, names):
+        """
+        Normalizes a Series of scraped names; missing values stay missing. A column with no names at all comes from
+        tabula as float NaN, so the names are looked up as strings.
+        """
+        mapped = names.astype('string').str.strip().str.lower().map(self.name_map(map_name))
+        self.hits[map_name] += int(mapped.notna().sum())
+        if map_name in self.misses:
+            self.misses[map_name].update(names[mapped.isna() & names.notna()].tolist())
+        return mapped.fillna(names)
+
+    def _date_edge_cases(self, path):
+        edge_cases = load_date_edge_cases(path)
+        # Longest first, so an edge case that contains another one wins. "(?!)" never matches.
+        keys = sorted((key for key in edge_cases if key), key=len, reverse=True)
+        return re.compile("|".join(re.escape(key) for key in keys) or "(?!)"), edge_cases
+
+    def date_edge_case(self, line):
+        """Returns the real date for a header line containing a known garbled date, or None."""
+        pattern, edge_cases = self._load(self.DATE_EDGE_CASES, self._date_edge_cases)
+        match = pattern.search(line)
+        return edge_cases[match.group(0)] if match else None
+
+    def take_stats(self):
+        """Returns the lookup counts since the last call and resets them."""
+        stats = {'hits': dict(self.hits), 'misses': {map_name: dict(names) for map_name, names in self.misses.items()}}
+        self.hits.clear()
+        for names in self.misses.values():
+            names.clear()
+        return stats
+
+    def add_stats(self, stats):
+        self.hits.update(stats['hits'])
+        for map_name, names in stats['misses'].items():
+            self.misses[map_name].update(names)
+
+    def write_unmapped(self, file_path):
+        """Writes every scraped name that fell through its map, most frequent first, to a CSV file."""
+        rows = [(map_name, name, count) for map_name, names in self.misses.items() for name, count in names.most_common()]
+        pd.DataFrame(rows, columns=['Map', 'Scraped', 'Count']).to_csv(file_path, index=False)
+        for map_name in self.misses:
+            print(f"{map_name} map: {self.hits[map_name]} hits, {sum(self.misses[map_name].values())} misses "
+                  f"({len(self.misses[map_name])} distinct unmapped names)")
+
+mappings = MappingRegistry()
+
 def extract_competition_name(lines):
     """Extract competition name from the first line of text."""
     return lines[0]
 
-def extract_date(lines, date_edge_cases, months):
-    """Extract start date from lines using date edge cases or regex pattern matching."""
-    date_line = None
+# The header is the strip of the first page above the results table, which starts at the top of SCAN_AREA
+HEADER_BOTTOM = 130
+# A header line naming one of these months is the event's date line
+DATE_LINE_PATTERN = re.compile(r"\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec|January|February|March|April|May|"
+                               r"June|July|August|September|October|November|December)\b", re.IGNORECASE)
+
+# How far below the strip header lines are still looked for, which covers a line or two above the table's header row
+HEADER_OVERFLOW = 40
+# The results table's column header row, where the header lines that run below the strip end
+TABLE_HEADER_PATTERN = re.compile(r"\bCompetitors?\b|\bRank\b", re.IGNORECASE)
+# "CR.pdf" or "CR-2.pdf" at the end of a Category Results Summary's file name
+FILE_NAME_SUFFIX_PATTERN = re.compile(r"CR(-\d+)?\.pdf$", re.IGNORECASE)
+
+def header_lines(page):
+    """
+    Returns the text lines of a page's header strip, and the lines just below it up to the results table's column
+    header row, for headers that run below the strip. Both come from one text extraction of the top of the page,
+    which stops HEADER_OVERFLOW below the strip, so the results table itself is not extracted.
+    """
+    x0, top, x1, bottom = page.bbox
+    lines = []
+    lines_below = []
+    for line in page.crop((x0, top, x1, min(top + HEADER_BOTTOM + HEADER_OVERFLOW, bottom))).extract_text_lines():
+        if line['top'] < top + HEADER_BOTTOM:
+            lines.append(line['text'])
+        elif TABLE_HEADER_PATTERN.search(line['text']):
+            break
+        else:
+            lines_below.append(line['text'])
+    return lines, lines_below
+
+# Words that start a category name, so they are kept even when the competition name has them too
+CATEGORY_START_WORDS = {'star', 'adult', 'senior', 'junior', 'novice', 'pre', 'juvenile', 'level', 'women', 'men',
+                        'ladies', 'girls', 'boys', 'gold', 'silver', 'bronze', 'diamond'}
+
+def category_from_file_name(file, competition_name):
+    """
+    A category name made from a Category Results Summary's file name, for a first page with no category in its
+    header: "2018PeaceSTAR-7WomenCR.pdf" of "2018 Peace Region STARSkate" gives "STAR 7 Women". The year and the
+    leading words the file name shares with the competition name are dropped. Returns None for other file names,
+    or if nothing is left.
+    """
+    name, is_summary = FILE_NAME_SUFFIX_PATTERN.subn('', os.path.basename(file))
+    if not is_summary:
+        return None
+    # Split the words run together, keeping the digits that follow letters: "PeaceSTAR-7WomenU14" -> "Peace STAR 7 Women U14"
+    words = re.findall(r"(?:[A-Z]+(?![a-z])|[A-Z]?[a-z]+)\d*|\d+", name)
+    competition_words = {word.lower() for word in re.findall(r"\w+", competition_name or '')}
+    while words and (re.fullmatch(r"\d{4}", words[0]) or
+                     (words[0].lower() in competition_words and words[0].lower() not in CATEGORY_START_WORDS)):
+        words.pop(0)
+    return ' '.join(words) or None
+
+def normalize_date(date_line):
+    """Turns a date line such as "November 15-17, 2019" into the "Month Year" start date, "November 2019"."""
+    date_parts = date_line.split(" ")
+    return date_parts[0] + " " + date_parts[-1]
+
+def extract_date(lines, registry):
+    """
+    Extract the start date from header lines 1 to 3, using date edge cases or the month names, and the category
+    name from the line after it. The category name is None when the header ends at the date.
+    """
     category_name = None
     start_date = None
-    for i in range(1, 4):
-        for key in date_edge_cases:
-            if key in lines[i]:
-                start_date = date_edge_cases[key]
-                category_name = lines[i + 1]
-                break
-        else:
-            match = re.search(r"\b(" + "|".join(months) + r")\b", lines[i], re.IGNORECASE)
-            if match:
-                date_line = lines[i]
-                category_name = lines[i + 1]
-                break
-            if date_line:
-                break
-    
-    if not date_line:
-        date_line = ""
+    # Headers can be shorter than the lines searched, so every index is bounded by the header
+    for i in range(1, min(4, len(lines))):
+        next_line = lines[i + 1] if i + 1 < len(lines) else None
+        edge_case_date = registry.date_edge_case(lines[i])
+        if edge_case_date:
+            start_date = edge_case_date
+            category_name = next_line
+        elif DATE_LINE_PATTERN.search(lines[i]):
+            if not start_date:
+                start_date = normalize_date(lines[i])
+            category_name = next_line
+            break
+
     if not start_date:
-        date_parts = date_line.split(" ")
-        start_date = date_parts[0] + " " + date_parts[-1]
+        start_date = normalize_date("")
     return start_date, category_name
 
-def competition_details(file):
-    """Extract competition details from a PDF file."""
-    months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec",
-              "January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
-
-    date_edge_cases = load_date_edge_cases('maps/date_edge_cases.csv')
+def competition_details(file, pdf_document=None):
+    """Extract competition details from a PDF file, or from pdf_document if the file is already open in pdfplumber."""
+    if pdf_document is None:
+        import pdfplumber
+        with pdfplumber.open(file) as pdf_document:
+            return competition_details(file, pdf_document)
+    lines, lines_below = header_lines(pdf_document.pages[0])
+    if not lines:
+        raise ValueError("The first page has no header text")
 
-    with pdfplumber.open(file) as pdf_document:
-        first_page = pdf_document.pages[0]
-        text_content = first_page.extract_text()
-    lines = text_content.splitlines()
-    
     competition_name = extract_competition_name(lines)
-    start_date, category_name = extract_date(lines, date_edge_cases, months)
-
+    start_date, category_name = extract_date(lines, mappings)
+    if category_name is None:
+        # The header is short, or runs below the strip: read on to the table, then fall back to the file name
+        start_date, category_name = extract_date(lines + lines_below, mappings)
+        if category_name is None and start_date.strip():
+            category_name = category_from_file_name(file, competition_name)
+    if category_name is None:
+        raise ValueError(f"The header has no category name after the date: {lines!r}")
 
     # Normalize competition and category names using mappings
-    # Load competition name mapping from CSV file
-    comp_mapping = load_mapping_from_csv('maps/comp_map.csv')
-    normalized_competition_name = normalize_name(competition_name, comp_mapping)
-    competition_name = competition_name.strip()
-
-    # Load category name mapping from CSV file
-    category_mapping = load_mapping_from_csv('maps/category_mapping.csv')
+    normalized_competition_name = mappings.normalize('competition', competition_name)
     category_name = category_name.strip()
-    normalized_category_name = normalize_name(category_name, category_mapping)
+    normalized_category_name = mappings.normalize('category', category_name)
 
     return normalized_competition_name, start_date, normalized_category_name
 
-def determine_category_type(category):
-    competitive_categories = ["Senior", "Junior", "Novice", "Pre-Novice"]
-    #Juvenile and Pre-Juvenile will trip things up, so we process them seperately. Pre-Juvenile U13 is not a Competitive event.
-    for level in competitive_categories:
-        if level in category:
-            return "Competitive"
-    if "Juvenile" in category:
-        for criteria in ["U11", "U12", "U14", "U15", "Men", "Dance", "Pairs"]:
-            if criteria in category:
-                return "Competitive"    
-    if "Adult" in category:
-        return "Adult"
-    if "Level" in category:
-        return "Special Olympics"
-    # Everything else is STARSkate
-    return "STARSkate"
-
-def determine_season(category_type, start_date):
-    # Typically our competitive season ends with Sectionals in November. This is a bit weird, because the 2023 Competitive Season would run from
-    # December 2023 to November 2024, ending with 2025 Sectionals - as Sectionals is qualifying for the 2025 Nationals.
-    # The STARSkate season ends in March with AB STARSkate and Adult Championships
-
-    date = parser.parse(start_date, fuzzy=True)
-
-    # Determine start and end dates of season based on category
-    if category_type == "Competitive":
-        if date.month >= 12:
-            start_date = f"{date.year}-12-01"
-            end_date = f"{date.year + 1}-11-30"
-        else:
-            start_date = f"{date.year - 1}-12-01"
-            end_date = f"{date.year}-11-30"
-    else:
-        if date.month >= 4:
-            start_date = f"{date.year}-04-01"
-            end_date = f"{date.year + 1}-03-31"
-        else:
-            start_date = f"{date.year - 1}-04-01"
-            end_date = f"{date.year}-03-31"
+def contains_any(names, words):
+    """Vectorized "any of words in name" over a Series of names."""
+    return names.str.contains("|".join(re.escape(word) for word in words), regex=True)
 
-    # Check if date is within the season
-    if start_date <= start_date <= end_date:
-        return end_date[:4]  # Extract the year from the end date
-    else:
-        return None
+def enrich_categories(category_df, program_type_df):
+    """Sets Category_Type and Program_Type on the whole category table in one vectorized pass."""
+    names = category_df['Category_Name'].fillna('')
 
-def is_Championship(competition_name):
-    if "Championships" in competition_name:
-        return True
-    return False
+    # Juvenile and Pre-Juvenile will trip things up, so we process them seperately. Pre-Juvenile U13 is not a Competitive event.
+    # Conditions are checked in order and everything else is STARSkate
+    category_df['Category_Type'] = np.select(
+        [contains_any(names, ["Senior", "Junior", "Novice", "Pre-Novice"]),
+         names.str.contains("Juvenile", regex=False) & contains_any(names, ["U11", "U12", "U14", "U15", "Men", "Dance", "Pairs"]),
+         names.str.contains("Adult", regex=False),
+         names.str.contains("Level", regex=False)],
+        ["Competitive", "Competitive", "Adult", "Special Olympics"],
+        default="STARSkate")
 
-# Create a column to define the type of program
-def category_program_type(category_name, program_type_df):
+    # Create a column to define the type of program. The first abbreviation found in the name wins, otherwise it is Combined.
     category_to_program_type = {
         'CS': 'Creative Skating Skill',
         'Triathlon': 'Triathalon',
@@ -190,34 +326,257 @@ def category_program_type(category_name, program_type_df):
         'FS': 'Free Program',
         'Artistic': 'Artistic',
     }
+    program_type_ids = {name: program_type_id for program_type_id, name in program_type_df['Program_Type'].items()}
+    category_df['Program_Type'] = np.select(
+        [names.str.contains(key, regex=False) for key in category_to_program_type],
+        [program_type_ids[value] for value in category_to_program_type.values()],
+        default=program_type_ids['Combined'])
+    return category_df
 
-    for key, value in category_to_program_type.items():
-        if key in category_name:
-            return program_type_df[program_type_df['Program_Type'] == value].index[0]
-    return program_type_df[program_type_df['Program_Type'] == 'Combined'].index[0]
+# Typically our competitive season ends with Sectionals in November. This is a bit weird, because the 2023 Competitive Season would run from
+# December 2023 to November 2024, ending with 2025 Sectionals - as Sectionals is qualifying for the 2025 Nationals.
+# The STARSkate season ends in March with AB STARSkate and Adult Championships.
+# So a season is named for the year it ends: the year of the start date, plus one from December (Competitive) or April (everything else).
+SEASON_BOUNDARIES = pd.DataFrame(
+    [(competitive, month, int(month >= (12 if competitive else 4))) for competitive in [True, False] for month in range(1, 13)],
+    columns=['Competitive', 'Month', 'Season_Offset'])
 
-def add_to_dataframe(df, record):
-    # Convert the record dictionary to a DataFrame
-    name_to_check = record[next(iter(record))]
-    if name_to_check in df.values:
-        return df
+MONTH_NUMBERS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTH_NUMBERS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+MONTH_NUMBERS['sept'] = 9
+MONTH_PATTERN = r"(?i)\b(" + "|".join(MONTH_NUMBERS) + r")\b"
+# The last four digit number in a start date is its year
+YEAR_PATTERN = r"\b(\d{4})\b(?!.*\b\d{4}\b)"
 
-    # Append the record to the DataFrame
-    df_record = pd.DataFrame([record])
-    df = pd.concat([df, df_record], ignore_index=True)
-    return df
+def parse_month_year(start_dates):
+    """
+    Returns the month and year of each start date as two Series. Dates are "Month Year" strings, so a regular
+    expression handles almost all of them and dateutil's fuzzy parser is only used, once per distinct value, for
+    the rest.
+    """
+    months = start_dates.str.extract(MONTH_PATTERN, expand=False).str.lower().map(MONTH_NUMBERS)
+    years = pd.to_numeric(start_dates.str.extract(YEAR_PATTERN, expand=False))
 
-def parse_pdf(pdf_file):
-    cat_results = pd.DataFrame()
-    scan_area = [130, 13, 522, 775]
-    tabula_scan = tabula.read_pdf(pdf_file, pages='all', stream=True, silent=True, area=scan_area)
-    
-    cat_results = pd.concat(tabula_scan, ignore_index=True)
+    unparsed = months.isna() | years.isna()
+    for start_date in start_dates[unparsed].dropna().unique():
+        try:
+            date = parser.parse(start_date, fuzzy=True)
+        except (ValueError, OverflowError) as e:
+            logging.error(f"Unable to read a date from start date {start_date!r}. Error message: {e}")
+            continue
+        is_date = start_dates == start_date
+        months[is_date] = date.month
+        years[is_date] = date.year
+    return months, years
+
+def competition_months(competition_df):
+    """Each competition's start as a "YYYY-MM" string, so dates sort as text, or "" when it cannot be read."""
+    months, years = parse_month_year(competition_df['Start_Date'].fillna('').astype(str))
+    known = (months.notna() & years.notna()).to_numpy()
+    formatted = (years.fillna(0).astype(int).astype(str) + '-' + months.fillna(0).astype(int).astype(str).str.zfill(2))
+    return pd.Series(np.where(known, formatted, ''), index=competition_df.index, dtype=object)
+
+def enrich_competitions(competition_df, first_category_types):
+    """
+    Sets Season and Championship on the whole competition table in one vectorized pass. A competition's season
+    follows the category type of the first category it was seen with, given in first_category_types.
+    """
+    keys = pd.DataFrame({'Start_Date': competition_df['Start_Date'].fillna('').astype(str).to_numpy(),
+                         'Competitive': (first_category_types == "Competitive").to_numpy()})
+    # Many competitions share a start date, so the season is resolved once per (category type, start date)
+    dates = keys.drop_duplicates().reset_index(drop=True)
+    months, years = parse_month_year(dates['Start_Date'])
+    dates['Month'] = months
+    offsets = dates.merge(SEASON_BOUNDARIES, on=['Competitive', 'Month'], how='left')['Season_Offset']
+    seasons = (years.to_numpy() + offsets.to_numpy())
+    dates['Season'] = [str(int(season)) if pd.notna(season) else None for season in seasons]
+    competition_df['Season'] = keys.merge(dates, on=['Start_Date', 'Competitive'], how='left')['Season'].to_numpy()
+    competition_df['Championship'] = competition_df['Competition_Name'].str.contains("Championships", regex=False)
+    return competition_df
+
+class KeyRegistry:
+    """
+    Surrogate keys for one dimension table.
+
+    Maps the name in the table's first column to its ID with O(1) lookup and append. IDs are assigned in insertion
+    order, so they are the index of the DataFrame built by to_frame() at export time.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.ids = {}
+        self.records = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, record):
+        """Returns the ID of the record's name, appending the record if the name is new."""
+        name = record[self.columns[0]]
+        key_id = self.ids.get(name)
+        if key_id is None:
+            key_id = len(self.records)
+            self.ids[name] = key_id
+            self.records.append(record)
+        return key_id
+
+    def ids_for(self, names):
+        """Replaces a Series of names with their IDs, adding any new names. Missing names stay missing."""
+        for name in names.dropna().unique():
+            if name not in self.ids:
+                self.add({self.columns[0]: name})
+        return names.map(self.ids)
+
+    def to_frame(self):
+        return pd.DataFrame(self.records, columns=self.columns)
+
+def new_key_registries():
+    return {
+        'competition': KeyRegistry(["Competition_Name", "Start_Date", "Season", "Championship"]),
+        'category': KeyRegistry(["Category_Name", "Category_Type", "Program_Type"]),
+        'club': KeyRegistry(["Club_Name"]),
+        'section': KeyRegistry(["Section"]),
+        'competitor': KeyRegistry(["Competitor_Name"]),
+    }
+
+def load_key_registries(file_path):
+    """Loads the key registries saved by a previous run, so IDs stay stable as the corpus grows."""
+    keys = new_key_registries()
+    if file_path and os.path.exists(file_path):
+        for table, records in pd.read_pickle(file_path).items():
+            for record in records:
+                keys[table].add(record)
+    return keys
+
+def save_key_registries(keys, file_path):
+    # Saved as plain records so the file does not depend on where KeyRegistry is imported from
+    if file_path:
+        pd.to_pickle({table: registry.records for table, registry in keys.items()}, file_path)
+
+# The results table area of a Category Results Summary as [top, left, bottom, right] in PDF points
+SCAN_AREA = [130, 13, 522, 775]
+
+def scan_table_tabula(pdf_file, pdf_document=None, tabula_mode='jvm'):
+    """
+    Scans the results table with tabula in stream mode.
+
+    In 'jvm' mode tabula runs in-process through jpype, so the Java VM is started once per process and reused for
+    every file rather than launched for each one. That is tabula-py's own default, but it needs the jpype1 package
+    and quietly launches java for every file without it, so check_tabula_mode() warns when it is missing.
+    'subprocess' mode always launches java for every call. tabula keeps the first mode used in a process.
+    """
+    import tabula
+
+    tabula_scan = tabula.read_pdf(pdf_file, pages='all', stream=True, silent=True, area=SCAN_AREA,
+                                  force_subprocess=(tabula_mode == 'subprocess'))
+    return pd.concat(tabula_scan, ignore_index=True)
+
+def check_tabula_mode(table_backend, tabula_mode):
+    """Warns when 'jvm' tabula mode cannot keep a JVM, because jpype1 is not installed. Returns whether it can."""
+    if table_backend != 'tabula' or tabula_mode != 'jvm':
+        return True
+    import importlib.util
+
+    if importlib.util.find_spec('jpype') is not None:
+        return True
+    message = ("jpype1 is not installed, so tabula launches java for every file instead of keeping a JVM per worker. "
+               "Install it with `pip install jpype1`, or pass --tabula-mode subprocess to silence this warning.")
+    logging.warning(message)
+    print(f"Warning: {message}")
+    return False
+
+def unique_column_names(header):
+    """Names blank header cells the way tabula does ("Unnamed: <position>") and de-duplicates repeated names."""
+    columns = []
+    for position, name in enumerate(header):
+        name = (name or '').strip() or f"Unnamed: {position}"
+        while name in columns:
+            name += '.1'
+        columns.append(name)
+    return columns
+
+def column_starts(words):
+    """
+    The x-positions where the results table's columns start, from the words of its column header row: the words
+    on the line of the "Rank" header, with words only a space apart joined into one column name. None if the words
+    have no "Rank" header.
+    """
+    rank = next((word for word in words if word['text'] == 'Rank'), None)
+    if rank is None:
+        return None
+    header = sorted((word for word in words if abs(word['top'] - rank['top']) < 3), key=lambda word: word['x0'])
+    starts = [header[0]['x0']]
+    for previous, word in zip(header, header[1:]):
+        # Column names are set well apart, so a gap wider than the text is tall starts a new column
+        if word['x0'] - previous['x1'] > word['bottom'] - word['top']:
+            starts.append(word['x0'])
+    return starts
+
+def scan_table_pdfplumber(pdf_file, pdf_document=None, tabula_mode=None):
+    """
+    Scans the results table with pdfplumber, cutting each column where its header starts, so values with spaces
+    such as club names stay in one cell. No Java is needed, and an already-open document is reused.
+    """
+    if pdf_document is None:
+        import pdfplumber
+        with pdfplumber.open(pdf_file) as pdf_document:
+            return scan_table_pdfplumber(pdf_file, pdf_document)
+
+    top, left, bottom, right = SCAN_AREA
+    page_tables = []
+    columns = None
+    starts = None
+    for page in pdf_document.pages:
+        x0, page_top, x1, page_bottom = page.bbox
+        area = page.crop((max(left, x0), max(top, page_top), min(right, x1), min(bottom, page_bottom)))
+        words = area.extract_words()
+        # Each page repeats the table header; a page without one continues the previous page's table
+        starts = column_starts(words) or starts
+        if starts is None or not words:
+            continue
+        # The rows only reach as far as their text, so the outer lines go at the leftmost and rightmost text, which
+        # also keeps values that start left of the first header in the first column
+        vertical_lines = ([min([starts[0]] + [word['x0'] for word in words])] + starts[1:] +
+                          [max([starts[-1] + 1] + [word['x1'] for word in words])])
+        table_settings = {"vertical_strategy": "explicit", "explicit_vertical_lines": vertical_lines,
+                          "horizontal_strategy": "text"}
+        rows = area.extract_table(table_settings) or []
+        for position, row in enumerate(rows):
+            if any(cell and cell.strip() == 'Rank' for cell in row):
+                columns = unique_column_names(row)
+                rows = rows[position + 1:]
+                break
+        rows = [row for row in rows if any(cell and cell.strip() for cell in row)]
+        if columns is None or not rows:
+            continue
+        rows = [row[:len(columns)] + [None] * (len(columns) - len(row)) for row in rows]
+        page_tables.append(pd.DataFrame(rows, columns=columns))
+
+    if not page_tables:
+        return pd.DataFrame()
+    return pd.concat(page_tables, ignore_index=True)
+
+TABLE_BACKENDS = {
+    'tabula': scan_table_tabula,
+    'pdfplumber': scan_table_pdfplumber,
+}
+
+def scan_table(pdf_file, table_backend='tabula', pdf_document=None, tabula_mode='jvm'):
+    """
+    Scans the results table area of every page of a Category Results Summary into one raw DataFrame using one of
+    the TABLE_BACKENDS. Every backend returns the table with the header row as the column names (or, like tabula
+    sometimes does, as the first row under "Unnamed" columns) for clean_results_table() to tidy up.
+    """
+    cat_results = TABLE_BACKENDS[table_backend](pdf_file, pdf_document=pdf_document, tabula_mode=tabula_mode)
     if cat_results.empty:
         print("empty df")
-        unable_to_scan.append(pdf_file)
     print(pdf_file)
+    return cat_results
+
+def parse_pdf(pdf_file, table_backend='tabula', tabula_mode='jvm'):
+    return clean_results_table(scan_table(pdf_file, table_backend, tabula_mode=tabula_mode))
 
+def clean_results_table(cat_results):
     # If this is a Category Results Summary for Pre-Novice or Novice Dance after the Pattern Dance we need to skip it, just return an empty dataframe
     if "FD" in cat_results.columns and cat_results['FD'].isnull().all():
         return pd.DataFrame()
@@ -257,78 +616,65 @@ def parse_pdf(pdf_file):
     return cat_results
 
 
-def correct_club_names(cat_results, mapping_file):
+def correct_club_names(cat_results, registry=mappings):
     """
-    Corrects the Club names in the category results DataFrame based on a mapping file.
+    Corrects the Club names in the category results DataFrame based on the club mapping.
 
     Args:
         cat_results (pd.DataFrame): Category results DataFrame.
-        mapping_file (str): Path to the mapping file (CSV format).
+        registry (MappingRegistry): Registry holding maps/club_mapping.csv.
 
     Returns:
         pd.DataFrame: Category results DataFrame with corrected Club names.
     """
-    club_mapping = pd.read_csv(mapping_file)
-    cat_results['Club'] = cat_results['Club'].map(club_mapping.set_index('Scraped')['Normalized']).fillna(cat_results['Club'])
+    cat_results['Club'] = registry.normalize_series('club', cat_results['Club'])
+    return cat_results
+
+
+def correct_competitor_names(cat_results, registry=mappings):
+    """
+    Corrects the Competitor names in the category results DataFrame based on maps/competitor_mapping.csv, which
+    holds the fuzzy_match.py proposals accepted so far.
+    """
+    cat_results['Competitor'] = registry.normalize_series('competitor', cat_results['Competitor'])
     return cat_results
 
 def correct_competition_names(competition_name, mapping_file):
     club_mapping = pd.read_csv(mapping_file)
     return competition_name
 
-def add_to_df(results_df, df, column_name, new_column_name):
-    # Get unique names from the results_df
-    unique_names = results_df[column_name].dropna().unique()
-
-    # Create a DataFrame to hold new names
-    new_names_df = pd.DataFrame({new_column_name: unique_names})
-
-    # Check if new names already exist in df
-    existing_names = df[new_column_name].unique()
-    new_names_df = new_names_df[~new_names_df[new_column_name].isin(existing_names)]
+# Compact dtypes for the Results table. Club, Section and Competitor can be blank on a results sheet, so those
+# use pandas' nullable integer type.
+RESULTS_DTYPES = {
+    'Rank': 'int16',
+    'Competitor': 'Int32',
+    'Club': 'Int32',
+    'Section': 'Int32',
+    'Points': 'float32',
+    'Competition_ID': 'int32',
+    'Category_ID': 'int32',
+}
+RANK_BINS = ['Gold', 'Silver', 'Bronze', '4-5', '6-10', '11-15', '16-20', '21-30', '31-40', '41-50', '50+']
 
-    # Update df with new names
-    df = pd.concat([df, new_names_df], ignore_index=True)
+def concat_results(result_chunks):
+    """Concatenates the per-file results tables once, with the compact RESULTS_DTYPES."""
+    if not result_chunks:
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in RESULTS_DTYPES.items()})
+    results_df = pd.concat(result_chunks, ignore_index=True)
+    return results_df.astype(RESULTS_DTYPES)
 
-    return df
-    
-
-def replace_names_with_ids(category_results_df, mapping_df, column_name, new_column_name):
-    # Create a dictionary mapping names to their IDs in mapping_df
-    name_mapping = mapping_df.reset_index().set_index(new_column_name).to_dict()['index']
-
-    # Replace names in category_results_df with their IDs
-    category_results_df[column_name] = category_results_df[column_name].map(name_mapping)
-
-    return category_results_df
-
-def add_competition_category_ids(category_results_df, competition_df, category_df, competition_name, category_name):
-    # Find competition ID (index) from competition dataframe
-    competition_id = competition_df[competition_df['Competition_Name'] == competition_name].index[0]
-
-    # Find category ID (index) from category dataframe
-    category_id = category_df[category_df['Category_Name'] == category_name].index[0]
-
-    # Add competition ID and category ID to category_results_df
-    category_results_df['Competition_ID'] = competition_id
-    category_results_df['Category_ID'] = category_id
-
-    return category_results_df
+def print_memory_report(results_df):
+    """Prints the memory used by each Results column next to what the same table takes with object columns."""
+    compact = results_df.memory_usage(deep=True)
+    as_objects = results_df.astype(object).memory_usage(deep=True)
+    print(f"Results: {len(results_df)} rows")
+    for column in results_df.columns:
+        print(f"  {column:<16}{str(results_df[column].dtype):<10}{compact[column] / 1024:>10.1f} KiB")
+    print(f"  {'total':<26}{compact.sum() / 1024:>10.1f} KiB ({as_objects.sum() / 1024:.1f} KiB as object dtype)")
 
 #Create a column that has a placement or placement range. This should aid in viz
 def create_rank_bins(df):
-    df['rank_bin'] = ''
-    df.loc[df['Rank'] == 1, 'rank_bin'] = 'Gold'
-    df.loc[df['Rank'] == 2, 'rank_bin'] = 'Silver'
-    df.loc[df['Rank'] == 3, 'rank_bin'] = 'Bronze'
-    df.loc[(df['Rank'] > 3) & (df['Rank'] <= 5), 'rank_bin'] = '4-5'
-    df.loc[(df['Rank'] > 5) & (df['Rank'] <= 10), 'rank_bin'] = '6-10'
-    df.loc[(df['Rank'] > 10) & (df['Rank'] <= 15), 'rank_bin'] = '11-15'
-    df.loc[(df['Rank'] > 15) & (df['Rank'] <= 20), 'rank_bin'] = '16-20'
-    df.loc[(df['Rank'] > 20) & (df['Rank'] <= 30), 'rank_bin'] = '21-30'
-    df.loc[(df['Rank'] > 30) & (df['Rank'] <= 40), 'rank_bin'] = '31-40'
-    df.loc[(df['Rank'] > 40) & (df['Rank'] <= 50), 'rank_bin'] = '41-50'
-    df.loc[(df['Rank'] > 50), 'rank_bin'] = '50+'
+    df['rank_bin'] = pd.cut(df['Rank'], bins=[0, 1, 2, 3, 5, 10, 15, 20, 30, 40, 50, np.inf], labels=RANK_BINS, ordered=True)
     return df
 
 def create_personal_best_df(results_df, competitor_df, category_df, program_type_df):
@@ -363,87 +709,606 @@ def create_recordfs_df(results_df, df1, df2, key1, key2, groupby_keys, rename_co
    
     return combined_df
 
-def process_header(pdf_file, competition_df, category_df, program_type_df):
-    competition_name, start_date, category_name = competition_details(pdf_file)
-    category_type = determine_category_type(category_name)
-    season = determine_season(category_type, start_date)
-    championship = is_Championship(competition_name)
-    program_type = category_program_type(category_name, program_type_df)
-    competition_df = add_to_dataframe(competition_df, {"Competition_Name": competition_name, "Start_Date": start_date, "Season": season,
-                                                           "Championship": championship})
-    category_df=add_to_dataframe(category_df, {"Category_Name": category_name, "Category_Type": category_type, "Program_Type": program_type})
-    competition_id = competition_df[competition_df['Competition_Name'] == competition_name].index[0]
-    category_id = category_df[category_df['Category_Name'] == category_name].index[0]
-
-    return competition_df, category_df, competition_id, category_id, category_name
-    
-def process_results_table(pdf_file, clubs_df, competitor_df, competition_id, category_id, section_df):
-    category_results_df = parse_pdf(pdf_file)
-    category_results_df = correct_club_names(category_results_df, 'maps/club_mapping.csv')
-    clubs_df = add_to_df(category_results_df, clubs_df, 'Club', 'Club_Name')
-    category_results_df = replace_names_with_ids(category_results_df, clubs_df, 'Club', 'Club_Name')
-    
-    competitor_df = add_to_df(category_results_df, competitor_df, 'Competitor', 'Competitor_Name')
-    category_results_df = replace_names_with_ids(category_results_df, competitor_df, 'Competitor', 'Competitor_Name')
+def verify_records(leaderboards, results_df, competitor_df, category_df, program_type_df, section_df, clubs_df):
+    """Recomputes every record from the full results and reports any difference from the incremental leaderboards."""
+    full_rebuild = {
+        'Personal Bests': create_personal_best_df(results_df, competitor_df, category_df, program_type_df),
+        'Section Records': create_records(results_df, section_df, category_df, "Section"),
+        'Club Records': create_records(results_df, clubs_df, category_df, "Club"),
+    }
+    for sheet, expected in full_rebuild.items():
+        actual = leaderboards[sheet]
+        matches = len(actual) == len(expected) and (actual.astype('int64').values == expected.astype('int64').values).all()
+        if matches:
+            print(f"{sheet}: incremental records match a full rebuild")
+        else:
+            logging.error(f"{sheet}: incremental records differ from a full rebuild ({len(actual)} vs {len(expected)} rows)")
+            print(f"{sheet}: incremental records DIFFER from a full rebuild, rerun with --rebuild-records")
+
+def process_header(header, keys):
+    competition_name, start_date, category_name = header
+    # The derived columns are filled in for the whole table by enrich_competitions() and enrich_categories()
+    competition_id = keys['competition'].add({"Competition_Name": competition_name, "Start_Date": start_date,
+                                              "First_Category": category_name})
+    category_id = keys['category'].add({"Category_Name": category_name})
+
+    return competition_id, category_id, category_name
     
-    section_df = add_to_df(category_results_df, section_df, 'Section', 'Section')
-    category_results_df = replace_names_with_ids(category_results_df, section_df, 'Section', 'Section')
+def process_results_table(category_results_df, keys, competition_id, category_id):
+    category_results_df = category_results_df.copy()
+    category_results_df['Club'] = keys['club'].ids_for(category_results_df['Club'])
+    category_results_df['Competitor'] = keys['competitor'].ids_for(category_results_df['Competitor'])
+    category_results_df['Section'] = keys['section'].ids_for(category_results_df['Section'])
     
     category_results_df['Competition_ID'] = competition_id
     category_results_df['Category_ID'] = category_id
     
-    return category_results_df, clubs_df, competitor_df, section_df
+    return category_results_df
 
 
-def process_pdf(pdf_file, competition_df, category_df, clubs_df, competitor_df, program_type_df, section_df):
-    competition_df, category_df, competition_id, category_id, category_name = process_header(pdf_file, competition_df, category_df, program_type_df)
-    if "Pairs" in category_name or "Pair" in category_name or "Dance" in category_name or "Couples" in category_name:
-        return pd.DataFrame(), competition_df, category_df, clubs_df, competitor_df, section_df
-    category_results_df, clubs_df, competitor_df, section_df = process_results_table(pdf_file, clubs_df, competitor_df, competition_id, category_id, section_df)
-    return category_results_df, competition_df, category_df, clubs_df, competitor_df, section_df
+def is_skipped_category(category_name):
+    """Dance, Pairs and Couples categories do not add value to this dataset."""
+    return "Pairs" in category_name or "Pair" in category_name or "Dance" in category_name or "Couples" in category_name
 
 
-def main():
-    pdf_dirs = "pdfs"
-    pdf_files = [os.path.join(pdf_dirs, f) for f in os.listdir(pdf_dirs) if f.endswith('.pdf')]
-    
-    competition_df = pd.DataFrame()
-    category_df = pd.DataFrame()
-    clubs_df = pd.DataFrame(columns=["Club_Name"])
-    section_df = pd.DataFrame(columns=["Section"])
-    competitor_df = pd.DataFrame(columns=["Competitor_Name"])
-    results_df = pd.DataFrame()
-    program_type_df = pd.DataFrame({'Program_Type':
-        ['Creative Skating Skill', 'Triathalon', 'Elements', 'Special Olympics', 'Short Program', 'Free Program', 'Artistic', 'Combined']})
-    
+def parse_file(pdf_file, table_backend='tabula', tabula_mode='jvm', header_only=False):
+    """
+    Map stage of the pipeline: validates the PDF, reads the header and, for Singles categories, scans the
+    results table and normalizes the club and competitor names. With header_only the table is not scanned, which is
+    all the catalog needs.
+
+    This only depends on the file and the mapping CSVs, so it can run in a worker process and its output can be
+    cached. Surrogate IDs are assigned afterwards by build_tables().
+
+    Returns:
+        - dict: "valid" (bool), "header" (competition name, start date, category name), "results" (DataFrame,
+          or None when the category is skipped), "unable_to_scan" (bool), "mapping_stats" (the lookups counted by
+          the MappingRegistry) and "timings" (seconds per stage). If parsing fails part way, "error" holds the
+          message, "error_stage" the stage that failed, and whatever was parsed before the failure is kept.
+    """
+    parsed = {"valid": False, "header": None, "results": None, "unable_to_scan": False, "error": None, "error_stage": None,
+              "mapping_stats": None, "timings": None}
+    import pdfplumber
+
+    timer = instrumentation.FileTimer()
+    try:
+        with timer('is_pdf'):
+            valid = is_pdf(pdf_file)
+        if not valid:
+            return parsed
+        parsed["valid"] = True
+        # The document is opened once and shared by the header and (for the pdfplumber backend) the table scan
+        with pdfplumber.open(pdf_file) as pdf_document:
+            with timer('competition_details'):
+                parsed["header"] = competition_details(pdf_file, pdf_document)
+            if not header_only and not is_skipped_category(parsed["header"][2]):
+                with timer('scan_table'):
+                    cat_results = scan_table(pdf_file, table_backend, pdf_document, tabula_mode)
+                parsed["unable_to_scan"] = cat_results.empty
+                with timer('clean_results'):
+                    cat_results = clean_results_table(cat_results)
+                    parsed["results"] = correct_competitor_names(correct_club_names(cat_results))
+    except Exception as e:
+        parsed["error"] = str(e)
+        parsed["error_stage"] = timer.current or 'parse_file'
+    finally:
+        parsed["mapping_stats"] = mappings.take_stats()
+        parsed["timings"] = timer.timings
+    return parsed
+
+
+def report_parse(pdf_file, parsed):
+    """Adds a fresh parse_file() result's timings and error to the run report. Cached parses are not reported again."""
+    instrumentation.report.add_file(pdf_file, parsed["timings"])
+    if parsed["error"] is not None:
+        instrumentation.report.error(parsed["error_stage"], pdf_file, parsed["error"])
+
+
+def process_pdf(parsed, keys):
+    if parsed["header"] is None:
+        return pd.DataFrame()
+    competition_id, category_id, category_name = process_header(parsed["header"], keys)
+    if parsed["results"] is None:
+        return pd.DataFrame()
+    return process_results_table(parsed["results"], keys, competition_id, category_id)
+
+
+def hash_file(file):
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_fingerprint(table_backend='tabula', maps_dir=MAPS_DIR):
+    """
+    Fingerprint of everything a cached parse depends on besides the PDF itself: the parser version, the table
+    backend and the mapping CSVs.
+    """
+    digest = hashlib.sha256(f"parser-{PARSER_VERSION}-{table_backend}".encode())
+    # Only the maps the registry reads, so other CSVs in maps/, such as fuzzy_match.py's proposals, do not count
+    for file_name in sorted(list(MappingRegistry.NAME_MAPS.values()) + [MappingRegistry.DATE_EDGE_CASES]):
+        map_file = os.path.join(maps_dir, file_name)
+        if not os.path.exists(map_file):
+            continue
+        digest.update(file_name.encode())
+        with open(map_file, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    Persistent cache of parse_file() output, keyed by PDF content hash.
+
+    Each parse is pickled to <cache_dir>/parsed/<hash>.pkl. The manifest maps every PDF path to its hash, size
+    and mtime, so unchanged files are not even re-hashed, and records the fingerprint the entries were built
+    with: if the parser version, the table backend or any maps/*.csv file changes, every entry is discarded.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, rebuild=False, table_backend='tabula'):
+        self.entries_dir = os.path.join(cache_dir, 'parsed')
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        self.table_backend = table_backend
+        self.fingerprint = cache_fingerprint(table_backend)
+        self.files = {}
+
+        manifest = self.read_manifest()
+        if rebuild or manifest.get('fingerprint') != self.fingerprint:
+            shutil.rmtree(self.entries_dir, ignore_errors=True)
+        else:
+            self.files = manifest.get('files', {})
+        os.makedirs(self.entries_dir, exist_ok=True)
+
+    def read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    @classmethod
+    def open_existing(cls, cache_dir=CACHE_DIR):
+        """
+        Opens the cache left by an earlier parse without discarding anything, for commands that only read it.
+        Raises ValueError if there is no cache or it no longer matches the parser and the maps/*.csv files.
+        """
+        cache = cls.__new__(cls)
+        cache.entries_dir = os.path.join(cache_dir, 'parsed')
+        cache.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        manifest = cache.read_manifest()
+        if not manifest:
+            raise ValueError(f"No parse cache in {cache_dir}, run the parse command first")
+        cache.table_backend = manifest.get('table_backend', 'tabula')
+        cache.fingerprint = cache_fingerprint(cache.table_backend)
+        if manifest['fingerprint'] != cache.fingerprint:
+            raise ValueError(f"The parse cache in {cache_dir} was built by another parser version or with other maps/*.csv files, "
+                             "run the parse command again")
+        cache.files = manifest['files']
+        return cache
+
+    def cached_parses(self):
+        """Returns the cached parse of every PDF in the manifest, without reading the PDFs themselves."""
+        parsed_files = {}
+        for pdf_file, entry in self.files.items():
+            entry_path = self._entry_path(entry['hash'])
+            if os.path.exists(entry_path):
+                parsed_files[pdf_file] = pd.read_pickle(entry_path)
+        return parsed_files
+
+    def _entry_path(self, content_hash):
+        return os.path.join(self.entries_dir, content_hash + '.pkl')
+
+    def file_hash(self, pdf_file):
+        """Returns the content hash of a PDF, reusing the manifest's hash if the size and mtime have not changed."""
+        stat = os.stat(pdf_file)
+        known = self.files.get(pdf_file)
+        if known and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+            return known['hash']
+        content_hash = hash_file(pdf_file)
+        self.files[pdf_file] = {'hash': content_hash, 'size': stat.st_size, 'mtime': stat.st_mtime}
+        return content_hash
+
+    def has(self, pdf_file):
+        return os.path.exists(self._entry_path(self.file_hash(pdf_file)))
+
+    def get(self, pdf_file):
+        """Returns the cached parse of a PDF, or None if the file is new or has changed."""
+        entry_path = self._entry_path(self.file_hash(pdf_file))
+        if not os.path.exists(entry_path):
+            return None
+        return pd.read_pickle(entry_path)
+
+    def put(self, pdf_file, parsed):
+        # Failed parses are not cached so they are retried on the next run
+        if parsed["error"] is not None:
+            return
+        pd.to_pickle(parsed, self._entry_path(self.file_hash(pdf_file)))
+
+    def save(self, pdf_files):
+        """Writes the manifest for the given PDFs and removes entries no PDF refers to anymore."""
+        self.files = {pdf_file: self.files[pdf_file] for pdf_file in pdf_files if pdf_file in self.files}
+        live_hashes = {entry['hash'] for entry in self.files.values()}
+        for entry_file in os.listdir(self.entries_dir):
+            if entry_file[:-len('.pkl')] not in live_hashes:
+                os.remove(os.path.join(self.entries_dir, entry_file))
+        with open(self.manifest_path, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'parser_version': PARSER_VERSION, 'table_backend': self.table_backend,
+                       'files': self.files}, f, indent=1)
+
+
+def parse_files(pdf_files, cache, workers=1, table_backend='tabula', tabula_mode='jvm'):
+    """
+    Runs parse_file() over every PDF that is not already in the parse cache, on a pool of worker processes
+    when workers > 1, and returns a dict of file path to parsed output.
+
+    Pool workers live for the whole run, so in 'jvm' tabula mode each worker starts Java once.
+    """
+    parse = functools.partial(parse_file, table_backend=table_backend, tabula_mode=tabula_mode)
+    parsed_files = {}
+    pending = []
+    for pdf_file in pdf_files:
+        with instrumentation.report.stage('cache_lookup', pdf_file):
+            parsed = cache.get(pdf_file)
+        if parsed is None:
+            pending.append(pdf_file)
+        else:
+            parsed_files[pdf_file] = parsed
+
+    if pending:
+        check_tabula_mode(table_backend, tabula_mode)
+    if workers > 1 and len(pending) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for pdf_file, parsed in zip(pending, executor.map(parse, pending)):
+                report_parse(pdf_file, parsed)
+                cache.put(pdf_file, parsed)
+                parsed_files[pdf_file] = parsed
+    else:
+        for pdf_file in pending:
+            parsed = parse(pdf_file)
+            report_parse(pdf_file, parsed)
+            cache.put(pdf_file, parsed)
+            parsed_files[pdf_file] = parsed
+    return parsed_files
+
+
+def open_catalog(cache_dir=CACHE_DIR):
+    # The catalog holds headers only, so its fingerprint leaves out the table backend
+    return catalog.Catalog(os.path.join(cache_dir, 'catalog.json'), cache_fingerprint(table_backend=None))
+
+
+def classify_headers(headers):
+    """
+    Adds Category_Type and Season to a DataFrame of catalog headers, by the rules of enrich_categories() and
+    enrich_competitions(). Each file's season follows its own category type.
+    """
+    headers = enrich_categories(headers, new_program_type_df())
+    return enrich_competitions(headers, headers['Category_Type'])
+
+
+def add_to_catalog(pdf_catalog, pdf_file, cache, parsed):
+    skipped = parsed["header"] is not None and is_skipped_category(parsed["header"][2])
+    pdf_catalog.add(pdf_file, cache.files[pdf_file], parsed, skipped)
+
+
+def read_headers(pdf_files, workers=1):
+    """Runs header only parse_file() over the PDFs, on a pool of worker processes when workers > 1."""
+    read = functools.partial(parse_file, header_only=True)
+    if workers > 1 and len(pdf_files) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(pdf_files, executor.map(read, pdf_files)))
+    return {pdf_file: read(pdf_file) for pdf_file in pdf_files}
+
+
+def update_catalog(pdf_catalog, pdf_files, cache, read_missing=False, workers=1):
+    """
+    Brings the catalog entries of pdf_files up to date: from the parse cache for the files parsed before and,
+    with read_missing, by reading the header of the others. Files the header read completes (not PDFs, skipped
+    categories) also go into the parse cache.
+    """
+    missing = []
     for pdf_file in pdf_files:
+        cache.file_hash(pdf_file)
+        if pdf_catalog.is_current(pdf_file, cache.files[pdf_file]):
+            continue
+        parsed = cache.get(pdf_file)
+        if parsed is None:
+            missing.append(pdf_file)
+        else:
+            add_to_catalog(pdf_catalog, pdf_file, cache, parsed)
+
+    if read_missing and missing:
+        with instrumentation.report.stage('read_headers'):
+            headers = read_headers(missing, workers)
+        for pdf_file, parsed in headers.items():
+            add_to_catalog(pdf_catalog, pdf_file, cache, parsed)
+            if pdf_catalog.is_complete(pdf_file):
+                cache.put(pdf_file, parsed)
+    pdf_catalog.classify(classify_headers)
+
+
+def parse_selected(pdf_files, cache, args):
+    """
+    Parse stage with the catalog: brings the catalog up to date, selects the PDFs matching --season,
+    --competition and --category-type, and parses those that are not in the parse cache. Files the catalog holds
+    completely are not opened again. Returns a dict of file path to parsed output for the selected files.
+    """
+    criteria = selection(args)
+    pdf_catalog = open_catalog(args.cache_dir)
+    # Without criteria every file is parsed anyway, so new files get their entries from the parse below
+    with instrumentation.report.stage('catalog'):
+        update_catalog(pdf_catalog, pdf_files, cache, read_missing=bool(criteria), workers=args.workers)
+    selected = pdf_catalog.select(pdf_files, **criteria) if criteria else pdf_files
+    if criteria:
+        print(f"Catalog: {len(selected)} of {len(pdf_files)} PDFs match {criteria}")
+
+    parsed_files = {}
+    for pdf_file in selected:
+        if pdf_catalog.is_complete(pdf_file):
+            parsed_files[pdf_file] = pdf_catalog.parsed(pdf_file)
+            if not cache.has(pdf_file):
+                cache.put(pdf_file, parsed_files[pdf_file])
+    pending = [pdf_file for pdf_file in selected if pdf_file not in parsed_files]
+    with instrumentation.report.stage('parse_files'):
+        parsed_files.update(parse_files(pending, cache, workers=args.workers, table_backend=args.table_backend,
+                                        tabula_mode=args.tabula_mode))
+
+    for pdf_file in pending:
+        if not pdf_catalog.is_current(pdf_file, cache.files[pdf_file]):
+            add_to_catalog(pdf_catalog, pdf_file, cache, parsed_files[pdf_file])
+    pdf_catalog.classify(classify_headers)
+    pdf_catalog.save(pdf_files)
+    return parsed_files
+
+
+def select_parsed(parsed_files, cache, args):
+    """
+    Keeps the parsed files whose catalog entries match --season, --competition and --category-type. The pipeline
+    does not keep the catalog, so the entries of parsed files that are missing or out of date are first filled in
+    from their parses, without opening the PDFs.
+    """
+    criteria = selection(args)
+    if not criteria:
+        return parsed_files
+    pdf_catalog = open_catalog(args.cache_dir)
+    with instrumentation.report.stage('catalog'):
+        for pdf_file, parsed in parsed_files.items():
+            if not pdf_catalog.is_current(pdf_file, cache.files[pdf_file]):
+                add_to_catalog(pdf_catalog, pdf_file, cache, parsed)
+        pdf_catalog.classify(classify_headers)
+        pdf_catalog.save(list(cache.files))
+    selected = {pdf_file: parsed for pdf_file, parsed in parsed_files.items() if pdf_catalog.matches(pdf_file, **criteria)}
+    print(f"Catalog: {len(selected)} of {len(parsed_files)} parsed PDFs match {criteria}")
+    return selected
+
+
+def build_tables(parsed_files, program_type_df, keys=None):
+    """
+    Reduce stage of the pipeline: walks the parsed files in sorted path order and assigns the surrogate IDs,
+    so the output does not depend on the order the workers finished in.
+
+    keys are the KeyRegistry objects to add to; pass the registries saved by an earlier run to keep its IDs.
+    Besides the tables, returns the (PDF, Results_ID of its first row, number of rows) of every PDF with results.
+    """
+    keys = keys if keys is not None else new_key_registries()
+    result_chunks = []
+    result_sources = []
+    n_results = 0
+
+    for pdf_file in sorted(parsed_files):
+        parsed = parsed_files[pdf_file]
+        if not parsed["valid"]:
+            invalid_files.append(pdf_file)
+        if parsed["unable_to_scan"]:
+            unable_to_scan.append(pdf_file)
+        mappings.add_stats(parsed["mapping_stats"])
         try:
-            if is_pdf(pdf_file):
-                category_results_df, competition_df, category_df, clubs_df, competitor_df, section_df = process_pdf(pdf_file, competition_df, category_df, clubs_df, competitor_df, program_type_df, section_df)
-                results_df = pd.concat([results_df, category_results_df], ignore_index=True)
+            with instrumentation.report.stage('process_results_table', pdf_file):
+                category_results_df = process_pdf(parsed, keys)
+            if not category_results_df.empty:
+                result_chunks.append(category_results_df)
+                result_sources.append((pdf_file, n_results, len(category_results_df)))
+                n_results += len(category_results_df)
         except Exception as e:
-            logging.error(f"Error processing file: {pdf_file}. Error message: {e}")
-    
-    results_df = create_rank_bins(results_df)
-    personal_best_df = create_personal_best_df(results_df, competitor_df, category_df, program_type_df)
-    section_records_df = create_records(results_df, section_df, category_df, "Section")
-    club_records_df = create_records(results_df, clubs_df, category_df, "Club")
+            instrumentation.report.error('process_results_table', pdf_file, e)
+            parsed["error"] = parsed["error"] or str(e)
+        if parsed["error"] is not None:
+            logging.error(f"Error processing file: {pdf_file}. Error message: {parsed['error']}")
 
-    writer = pd.ExcelWriter("skate_ab_project.xlsx")
-    
-    section_df.to_excel(writer, sheet_name='Sections')
-    clubs_df.to_excel(writer, sheet_name='Clubs')
-    competitor_df.to_excel(writer, sheet_name='Competitors')
-    competition_df.to_excel(writer, sheet_name='Competitions')
-    category_df.to_excel(writer, sheet_name='Categories')
-    program_type_df.to_excel(writer, sheet_name='Program Types')
-    personal_best_df.to_excel(writer, sheet_name="Personal Bests")
-    section_records_df.to_excel(writer, sheet_name="Section Records")
-    club_records_df.to_excel(writer, sheet_name="Club Records")
-    results_df.to_excel(writer, sheet_name='Results')
-    
-    writer.close()
+    with instrumentation.report.stage('enrich'):
+        category_df = enrich_categories(keys['category'].to_frame(), program_type_df)
+        competition_df = keys['competition'].to_frame()
+        first_categories = pd.Series([record.get("First_Category") for record in keys['competition'].records], dtype=object)
+        first_category_types = first_categories.map(category_df.set_index('Category_Name')['Category_Type'])
+        competition_df = enrich_competitions(competition_df, first_category_types)
+        results_df = create_rank_bins(concat_results(result_chunks))
 
-    
-main()
+    return (competition_df, category_df, keys['club'].to_frame(), keys['section'].to_frame(),
+            keys['competitor'].to_frame(), results_df, result_sources)
+
+
+def output_sinks(value):
+    """argparse type for --output: a comma separated list of sink names."""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in sinks.SINKS]
+    if unknown or not names:
+        raise argparse.ArgumentTypeError(f"unknown output format(s) {', '.join(unknown)}; choose from {', '.join(sinks.SINKS)}")
+    return names
+
+def build_arg_parser(add_help=True):
+    arg_parser = argparse.ArgumentParser(description="Parse Category Results Summary PDFs into the Skate AB project workbook.",
+                                         add_help=add_help)
+    arg_parser.add_argument('--pdf-dir', default='pdfs', help="Directory of downloaded PDFs (default: pdfs)")
+    arg_parser.add_argument('--cache-dir', default=CACHE_DIR, help=f"Directory for the parse cache (default: {CACHE_DIR})")
+    arg_parser.add_argument('--rebuild', action='store_true', help="Ignore the parse cache and re-parse every PDF")
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Number of worker processes used to parse PDFs (default: number of CPUs)")
+    arg_parser.add_argument('--keys-file',
+                            help="Keep the surrogate IDs in this file so they stay stable across runs as new PDFs are added")
+    arg_parser.add_argument('--table-backend', choices=sorted(TABLE_BACKENDS), default='tabula',
+                            help="Library used to scan the results tables (default: tabula)")
+    arg_parser.add_argument('--tabula-mode', choices=['jvm', 'subprocess'], default='jvm',
+                            help="Run tabula in a persistent in-process JVM (needs the jpype1 package, warns without it) or launch java per file (default: jvm)")
+    arg_parser.add_argument('--rebuild-records', action='store_true',
+                            help="Recompute Personal Bests and Section/Club Records from all results instead of only new PDFs")
+    arg_parser.add_argument('--verify-records', action='store_true',
+                            help="Check the incrementally maintained records against a full recomputation")
+    arg_parser.add_argument('--output', type=output_sinks, default=['excel'],
+                            help=f"Comma separated output formats from {', '.join(sinks.SINKS)} (default: excel)")
+    arg_parser.add_argument('--output-dir', default='.', help="Directory the outputs are written to; a selection's go to a selection-... subdirectory of it (default: .)")
+    return arg_parser
+
+
+def add_selection_arguments(arg_parser):
+    """Adds --season, --competition and --category-type, which select PDFs by their catalog entries."""
+    group = arg_parser.add_argument_group('selection', "Process only the PDFs whose header matches, as recorded in "
+                                                       "the catalog in the cache directory")
+    group.add_argument('--season', help="Season, named for the year it ends, e.g. 2019")
+    group.add_argument('--competition', help="Part of the competition name, ignoring case")
+    group.add_argument('--category-type', help="Competitive, STARSkate, Adult or Special Olympics")
+    return arg_parser
+
+
+def selection(args):
+    """The selection arguments given, as keyword arguments for Catalog.select()."""
+    return {field: getattr(args, field) for field in catalog.SELECTION_FIELDS if getattr(args, field, None) is not None}
+
+
+def parse_args(argv=None):
+    arg_parser = instrumentation.add_arguments(add_selection_arguments(build_arg_parser()),
+                                               default_description="<cache-dir>/run_report.json")
+    return arg_parser.parse_args(argv)
+
+
+def list_pdf_files(pdf_dir):
+    return [os.path.join(pdf_dir, f) for f in os.listdir(pdf_dir) if f.endswith('.pdf')]
+
+
+def new_program_type_df():
+    return pd.DataFrame({'Program_Type':
+        ['Creative Skating Skill', 'Triathalon', 'Elements', 'Special Olympics', 'Short Program', 'Free Program', 'Artistic', 'Combined']})
+
+
+# The workbook's sheets, in order
+WORKBOOK_SHEETS = ['Sections', 'Clubs', 'Competitors', 'Competitions', 'Categories', 'Program Types', 'Personal Bests',
+                   'Section Records', 'Club Records', 'Results']
+# Subdirectory of the output directory the records command writes to, so the full outputs are left as they are
+RECORDS_DIR = 'records'
+
+def build_base_tables(parsed_files, cache, args):
+    """
+    Builds the tables from the parsed files, keeping the surrogate IDs in --keys-file. Returns the key registries,
+    the tables other than the records by sheet name, and the (PDF, content hash, Results_ID of its first row, number
+    of rows) of every PDF with results. The parse cache must already hold an entry for every parsed file.
+    """
+    program_type_df = new_program_type_df()
+    keys = load_key_registries(args.keys_file)
+    with instrumentation.report.stage('build_tables'):
+        competition_df, category_df, clubs_df, section_df, competitor_df, results_df, result_sources = build_tables(parsed_files, program_type_df, keys)
+    save_key_registries(keys, args.keys_file)
+
+    sources = [(pdf_file, cache.files[pdf_file]['hash'], start, n_rows) for pdf_file, start, n_rows in result_sources]
+    tables = {
+        'Sections': section_df,
+        'Clubs': clubs_df,
+        'Competitors': competitor_df,
+        'Competitions': competition_df,
+        'Categories': category_df,
+        'Program Types': program_type_df,
+        'Results': results_df,
+    }
+    return keys, tables, sources
+
+
+def build_record_tables(keys, tables, sources, cache, args):
+    """
+    Brings the Personal Bests and Section/Club Records up to date with the tables of build_base_tables() and returns
+    them by sheet name. The saved records cover the whole corpus, so those of a selection are computed without them.
+    """
+    with instrumentation.report.stage('build_leaderboards'):
+        leaderboards = records.build_leaderboards(tables['Results'], sources, keys, tables['Categories'], tables['Program Types'],
+                                                  None if selection(args) else os.path.join(args.cache_dir, 'records.pkl'),
+                                                  cache.fingerprint, rebuild=args.rebuild_records)
+    if args.verify_records:
+        with instrumentation.report.stage('verify_records'):
+            verify_records(leaderboards, tables['Results'], tables['Competitors'], tables['Categories'],
+                           tables['Program Types'], tables['Sections'], tables['Clubs'])
+    return {sheet_name: leaderboards[sheet_name] for sheet_name in ['Personal Bests', 'Section Records', 'Club Records']}
+
+
+def build_output_tables(parsed_files, cache, args):
+    """
+    Reduce stage: builds the tables from the parsed files and brings the records, the dashboard extracts and the
+    competitor history index up to date. Returns the tables in workbook sheet order, then the extracts. The parse
+    cache must already hold an entry for every parsed file.
+    """
+    keys, tables, sources = build_base_tables(parsed_files, cache, args)
+    # The saved records, extracts, history and unmapped names cover the whole corpus, so those of a selection are
+    # computed without them, and the history and unmapped names are left as they are
+    selected = bool(selection(args))
+    if not selected:
+        mappings.write_unmapped(os.path.join(args.cache_dir, 'unmapped_names.csv'))
+
+    tables.update(build_record_tables(keys, tables, sources, cache, args))
+    tables = {sheet_name: tables[sheet_name] for sheet_name in WORKBOOK_SHEETS}
+    competition_df, category_df, competitor_df = tables['Competitions'], tables['Categories'], tables['Competitors']
+    with instrumentation.report.stage('build_extracts'):
+        tables.update(extracts.build_extracts(tables['Results'], sources, competition_df, category_df, tables['Clubs'],
+                                              tables['Sections'], None if selected else os.path.join(args.cache_dir, 'extracts.pkl'),
+                                              cache.fingerprint))
+    if not selected:
+        with instrumentation.report.stage('build_history'):
+            history.build_history(tables['Results'], sources, (competition_df, category_df, competitor_df),
+                                  competition_months(competition_df), tables['Program Types'],
+                                  os.path.join(args.cache_dir, history.STATE_FILE), cache.fingerprint)
+    return tables
+
+
+def output_dir(args):
+    """
+    The directory the outputs are written to: --output-dir, or for a selection a subdirectory of it named for the
+    selection, e.g. selection-season-2019, so a selection's outputs do not replace those of the whole corpus.
+    """
+    criteria = selection(args)
+    if not criteria:
+        return args.output_dir
+    name = '_'.join(f"{field.replace('_', '-')}-{value}" for field, value in criteria.items())
+    return os.path.join(args.output_dir, 'selection-' + re.sub(r"[^\w.-]+", '-', name).strip('-'))
+
+
+def write_records(parsed_files, cache, args):
+    """
+    Reduce and output stages for the records alone: builds the tables, brings only the Personal Bests and
+    Section/Club Records up to date and writes them to every sink in args.output, in the RECORDS_DIR subdirectory
+    of the output directory. The extracts, the history and the unmapped names are left as they are.
+    """
+    keys, tables, sources = build_base_tables(parsed_files, cache, args)
+    sinks.write_tables(build_record_tables(keys, tables, sources, cache, args), args.output,
+                       os.path.join(output_dir(args), RECORDS_DIR))
+
+
+def write_outputs(parsed_files, cache, args):
+    """Reduce and output stages: builds the tables and writes them to every sink in args.output."""
+    tables = build_output_tables(parsed_files, cache, args)
+    sinks.write_tables(tables, args.output, output_dir(args))
+    print_memory_report(tables['Results'])
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging()
+    try:
+        with instrumentation.profiled(args.profile):
+            pdf_files = list_pdf_files(args.pdf_dir)
+            cache = ParseCache(args.cache_dir, rebuild=args.rebuild, table_backend=args.table_backend)
+            parsed_files = parse_selected(pdf_files, cache, args)
+            cache.save(pdf_files)
+            write_outputs(parsed_files, cache, args)
+    finally:
+        instrumentation.report.write(args.report or os.path.join(args.cache_dir, 'run_report.json'), args.slowest)
+
+
+# The guard keeps worker processes from re-running main() on platforms that spawn rather than fork
+if __name__ == '__main__':
+    main()
 
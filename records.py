@@ -0,0 +1,124 @@
+"""
+Personal Bests, Section Records and Club Records, maintained incrementally.
+
+Each leaderboard keeps the best Points for every key, e.g. (Competitor, Program_Type), together with where that
+result came from: the PDF it was read from and its row within that PDF's results. Between runs the leaderboards
+are saved with the list of PDFs they have already seen, so a run only looks at the results of new PDFs and
+re-evaluates just the keys those results touch.
+
+The state is saved and checked as described in incremental.py. A best result cannot be taken back without the
+results it beat, so the leaderboards are rebuilt from scratch when a PDF they have seen changes or disappears.
+"""
+
+import pandas as pd
+
+import incremental
+
+# Sheet name -> key columns, as in the results table
+LEADERBOARDS = {
+    'Personal Bests': ['Competitor', 'Program_Type'],
+    'Section Records': ['Section', 'Category_ID'],
+    'Club Records': ['Club', 'Category_ID'],
+}
+
+
+class Leaderboard:
+    """The best result per key, as {key names: (points, source PDF, row within the PDF's results)}."""
+
+    def __init__(self, key_columns, best=None):
+        self.key_columns = key_columns
+        self.best = best if best is not None else {}
+
+    def update(self, batch, positions):
+        """
+        Folds a batch of new results into the leaderboard and returns the number of keys whose best changed.
+
+        batch holds the key columns as names plus Points, Source and Row, in Results order. positions maps each
+        source PDF to the Results_ID of its first row, which breaks ties the way idxmax() does: the earliest
+        result keeps the record.
+        """
+        batch = batch.dropna(subset=self.key_columns + ['Points'])
+        if batch.empty:
+            return 0
+        winners = batch.loc[batch.groupby(self.key_columns, sort=False)['Points'].idxmax()]
+
+        changed = 0
+        key_values = zip(*(winners[column] for column in self.key_columns))
+        for key, points, source, row in zip(key_values, winners['Points'], winners['Source'], winners['Row']):
+            points = float(points)
+            current = self.best.get(key)
+            if (current is None or points > current[0] or
+                    (points == current[0] and positions[source] + row < positions[current[1]] + current[2])):
+                self.best[key] = (points, source, int(row))
+                changed += 1
+        return changed
+
+    def to_frame(self, resolve, positions):
+        """
+        Returns the leaderboard as the key ID columns plus Results_ID, sorted by key like a groupby.
+        resolve turns a tuple of key names into a tuple of IDs.
+        """
+        rows = [resolve(key) + (positions[source] + row,) for key, (points, source, row) in self.best.items()]
+        df = pd.DataFrame(rows, columns=self.key_columns + ['Results_ID'])
+        return df.sort_values(self.key_columns).reset_index(drop=True)
+
+
+def name_batch(results_df, sources, keys, category_df, program_type_df):
+    """
+    Selects the results of the given source PDFs and replaces the leaderboard key IDs with names.
+
+    sources are (PDF, Results_ID of its first row, number of rows) tuples.
+    """
+    batch = incremental.source_rows(results_df, sources, ['Competitor', 'Section', 'Club', 'Category_ID', 'Points'])
+    batch['Program_Type'] = batch['Category_ID'].map(category_df['Program_Type']).map(program_type_df['Program_Type'])
+    batch['Category_ID'] = batch['Category_ID'].map(category_df['Category_Name'])
+    for column, registry in [('Competitor', 'competitor'), ('Section', 'section'), ('Club', 'club')]:
+        names = (record[keys[registry].columns[0]] for record in keys[registry].records)
+        batch[column] = batch[column].astype(object).map(incremental.names_by_id(names))
+    return batch
+
+
+def key_resolver(key_columns, keys, program_type_df):
+    """Returns a function turning a tuple of key names back into the current surrogate IDs."""
+    program_type_ids = {name: program_type_id for program_type_id, name in program_type_df['Program_Type'].items()}
+    lookups = {
+        'Competitor': keys['competitor'].ids,
+        'Section': keys['section'].ids,
+        'Club': keys['club'].ids,
+        'Category_ID': keys['category'].ids,
+        'Program_Type': program_type_ids,
+    }
+    return lambda key: tuple(lookups[column][name] for column, name in zip(key_columns, key))
+
+
+def build_leaderboards(results_df, sources, keys, category_df, program_type_df, state_file, fingerprint, rebuild=False):
+    """
+    Brings the saved leaderboards up to date with results_df and returns them as {sheet name: DataFrame}.
+
+    sources lists (PDF, content hash, Results_ID of its first row, number of rows) for every PDF that contributed
+    results, in Results order. Only the PDFs the saved state has not seen are read; with rebuild, or when the saved
+    state no longer matches the corpus, every result is.
+    """
+    state = None if rebuild else incremental.load_state(state_file, fingerprint)
+    current_files = {source: file_hash for source, file_hash, start, n_rows in sources}
+    if state is not None and incremental.stale_sources(state['files'], current_files):
+        print("Records: saved state no longer matches the corpus, rebuilding")
+        state = None
+    if state is None:
+        state = {'fingerprint': fingerprint, 'files': {}, 'leaderboards': {sheet: {} for sheet in LEADERBOARDS}}
+
+    positions = {source: start for source, file_hash, start, n_rows in sources}
+    new_sources = [(source, start, n_rows) for source, file_hash, start, n_rows in sources if source not in state['files']]
+    batch = name_batch(results_df, new_sources, keys, category_df, program_type_df)
+
+    leaderboards = {}
+    for sheet, key_columns in LEADERBOARDS.items():
+        leaderboard = Leaderboard(key_columns, state['leaderboards'][sheet])
+        changed = leaderboard.update(batch, positions)
+        print(f"{sheet}: {len(batch)} new results from {len(new_sources)} PDFs, {changed} of {len(leaderboard.best)} records changed")
+        leaderboards[sheet] = leaderboard.to_frame(key_resolver(key_columns, keys, program_type_df), positions)
+
+    state['files'].update({source: current_files[source] for source, start, n_rows in new_sources})
+    if state_file:
+        pd.to_pickle(state, state_file)
+    return leaderboards
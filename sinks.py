@@ -0,0 +1,166 @@
+"""
+Output sinks for the Skate AB project tables.
+
+Every sink takes the same ordered dict of sheet name -> DataFrame that the processor builds, where each
+dimension table's index is its surrogate ID. Excel is the original workbook; Parquet, SQLite and CSV are much
+faster to write and are what Tableau or ad hoc queries should read.
+"""
+
+import os
+import sqlite3
+
+import pandas as pd
+
+import instrumentation
+
+WORKBOOK_NAME = "skate_ab_project.xlsx"
+DATABASE_NAME = "skate_ab_project.db"
+
+# Sheet name -> (table name, name of the index column). Tables are listed parents first, so the SQLite tables
+# are loaded in an order that satisfies their foreign keys.
+TABLE_SCHEMA = {
+    'Sections': ('sections', 'Section_ID'),
+    'Clubs': ('clubs', 'Club_ID'),
+    'Competitors': ('competitors', 'Competitor_ID'),
+    'Competitions': ('competitions', 'Competition_ID'),
+    'Program Types': ('program_types', 'Program_Type_ID'),
+    'Categories': ('categories', 'Category_ID'),
+    'Results': ('results', 'Results_ID'),
+    'Personal Bests': ('personal_bests', 'Personal_Best_ID'),
+    'Section Records': ('section_records', 'Section_Record_ID'),
+    'Club Records': ('club_records', 'Club_Record_ID'),
+    'Medal Counts': ('medal_counts', 'Medal_Count_ID'),
+    'Participants': ('participants', 'Participants_ID'),
+    'Category Points': ('category_points', 'Category_Points_ID'),
+}
+
+# Table -> {column: (referenced table, referenced column)}
+FOREIGN_KEYS = {
+    'categories': {'Program_Type': ('program_types', 'Program_Type_ID')},
+    'results': {
+        'Competitor': ('competitors', 'Competitor_ID'),
+        'Club': ('clubs', 'Club_ID'),
+        'Section': ('sections', 'Section_ID'),
+        'Competition_ID': ('competitions', 'Competition_ID'),
+        'Category_ID': ('categories', 'Category_ID'),
+    },
+    'personal_bests': {
+        'Competitor': ('competitors', 'Competitor_ID'),
+        'Program_Type': ('program_types', 'Program_Type_ID'),
+        'Results_ID': ('results', 'Results_ID'),
+    },
+    'section_records': {
+        'Section': ('sections', 'Section_ID'),
+        'Category_ID': ('categories', 'Category_ID'),
+        'Results_ID': ('results', 'Results_ID'),
+    },
+    'club_records': {
+        'Club': ('clubs', 'Club_ID'),
+        'Category_ID': ('categories', 'Category_ID'),
+        'Results_ID': ('results', 'Results_ID'),
+    },
+}
+
+# The Results columns dashboards filter and join on
+INDEXED_COLUMNS = {
+    'results': ['Competitor', 'Club', 'Section', 'Category_ID', 'Competition_ID'],
+}
+
+
+def table_name(sheet_name):
+    """Returns the table name used by the SQLite, Parquet and CSV sinks for a workbook sheet."""
+    if sheet_name in TABLE_SCHEMA:
+        return TABLE_SCHEMA[sheet_name][0]
+    return sheet_name.lower().replace(' ', '_')
+
+
+def with_id_column(sheet_name, df):
+    """Turns the DataFrame index into an explicit ID column for the sinks that do not keep an index."""
+    id_column = TABLE_SCHEMA.get(sheet_name, (None, 'ID'))[1]
+    return df.rename_axis(id_column).reset_index()
+
+
+def widen_floats(df):
+    """Excel and CSV would print float32 values with their binary noise, so widen them back to 2 decimal places."""
+    float32_columns = df.select_dtypes('float32').columns
+    if len(float32_columns) == 0:
+        return df
+    return df.astype({column: 'float64' for column in float32_columns}).round({column: 2 for column in float32_columns})
+
+
+def sqlite_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def create_table_sql(table, id_column, df):
+    columns = [f'"{id_column}" INTEGER PRIMARY KEY']
+    columns += [f'"{column}" {sqlite_type(dtype)}' for column, dtype in df.dtypes.items()]
+    for column, (parent, parent_column) in FOREIGN_KEYS.get(table, {}).items():
+        if column in df.columns:
+            columns.append(f'FOREIGN KEY ("{column}") REFERENCES "{parent}" ("{parent_column}")')
+    return f'CREATE TABLE "{table}" (\n    ' + ',\n    '.join(columns) + '\n)'
+
+
+def write_excel(tables, output_dir):
+    with pd.ExcelWriter(os.path.join(output_dir, WORKBOOK_NAME)) as writer:
+        for sheet_name, df in tables.items():
+            widen_floats(df).to_excel(writer, sheet_name=sheet_name)
+
+
+def write_csv(tables, output_dir):
+    csv_dir = os.path.join(output_dir, 'csv')
+    os.makedirs(csv_dir, exist_ok=True)
+    for sheet_name, df in tables.items():
+        with_id_column(sheet_name, widen_floats(df)).to_csv(os.path.join(csv_dir, table_name(sheet_name) + '.csv'), index=False)
+
+
+def write_parquet(tables, output_dir):
+    parquet_dir = os.path.join(output_dir, 'parquet')
+    os.makedirs(parquet_dir, exist_ok=True)
+    for sheet_name, df in tables.items():
+        with_id_column(sheet_name, df).to_parquet(os.path.join(parquet_dir, table_name(sheet_name) + '.parquet'), index=False)
+
+
+def write_sqlite(tables, output_dir):
+    """
+    Writes every table to a SQLite database with primary keys, foreign keys and indexes on the Results ID
+    columns. The database is built in a temporary file and moved into place, so readers never see half a load.
+    """
+    database = os.path.join(output_dir, DATABASE_NAME)
+    temp_database = database + '.tmp'
+    if os.path.exists(temp_database):
+        os.remove(temp_database)
+
+    ordered = sorted(tables, key=lambda sheet_name: list(TABLE_SCHEMA).index(sheet_name) if sheet_name in TABLE_SCHEMA else len(TABLE_SCHEMA))
+    with sqlite3.connect(temp_database) as connection:
+        for sheet_name in ordered:
+            df = widen_floats(tables[sheet_name])
+            table = table_name(sheet_name)
+            id_column = TABLE_SCHEMA.get(sheet_name, (None, 'ID'))[1]
+            connection.execute(create_table_sql(table, id_column, df))
+            df.rename_axis(id_column).to_sql(table, connection, if_exists='append', index=True)
+            for column in INDEXED_COLUMNS.get(table, []):
+                connection.execute(f'CREATE INDEX "idx_{table}_{column}" ON "{table}" ("{column}")')
+    connection.close()
+    os.replace(temp_database, database)
+
+
+SINKS = {
+    'excel': write_excel,
+    'parquet': write_parquet,
+    'sqlite': write_sqlite,
+    'csv': write_csv,
+}
+
+
+def write_tables(tables, sinks, output_dir='.'):
+    """Writes the tables to every sink named in sinks."""
+    os.makedirs(output_dir, exist_ok=True)
+    for sink in sinks:
+        with instrumentation.report.stage(f'write_{sink}'):
+            SINKS[sink](tables, output_dir)
+        print(f"Wrote {sink} output to {output_dir}")
@@ -0,0 +1,70 @@
+"""
+Selecting cached parses by --season, --competition and --category-type when the catalog was never written, as after
+`cli.py run`, or is out of date with the parse cache.
+"""
+
+import argparse
+import json
+import os
+
+import pytest
+
+import processor
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEADERS = {
+    'juvenile.pdf': ('2019 Calgary Winter Invitational', 'November 2019', 'Juvenile Girls U14'),
+    'star.pdf': ('2019 Calgary Winter Invitational', 'November 2019', 'STAR 5 Women U13 (FS)'),
+    'adult.pdf': ('2020 Adult Championships', 'March 2020', 'Gold Women (Adult - Artistic)'),
+}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """A parse cache of three parses, with no catalog next to it."""
+    # The cache and catalog fingerprints cover the maps/*.csv files, read relative to the working directory
+    monkeypatch.chdir(REPO_DIR)
+    cache = processor.ParseCache(str(tmp_path / 'cache'))
+    for name, header in HEADERS.items():
+        pdf_file = str(tmp_path / name)
+        with open(pdf_file, 'w') as f:
+            f.write(name)
+        cache.put(pdf_file, {"valid": True, "header": header, "results": None, "unable_to_scan": False, "error": None,
+                             "error_stage": None, "mapping_stats": None, "timings": None})
+    cache.save(list(cache.files))
+    return processor.ParseCache.open_existing(str(tmp_path / 'cache'))
+
+
+def select(cache, **criteria):
+    args = argparse.Namespace(cache_dir=os.path.dirname(cache.manifest_path),
+                              **{field: criteria.get(field) for field in ['season', 'competition', 'category_type']})
+    return sorted(os.path.basename(pdf_file) for pdf_file in processor.select_parsed(cache.cached_parses(), cache, args))
+
+
+def test_missing_catalog_is_filled_in_from_the_parse_cache(cache):
+    catalog_path = os.path.join(os.path.dirname(cache.manifest_path), 'catalog.json')
+    assert not os.path.exists(catalog_path)
+
+    assert select(cache, category_type='STARSkate') == ['star.pdf']
+    assert select(cache, category_type='Competitive') == ['juvenile.pdf']
+    # A Competitive category in November is in the season ending that year, a STARSkate one in the next
+    assert select(cache, season='2020', competition='calgary') == ['star.pdf']
+    with open(catalog_path) as f:
+        assert len(json.load(f)['files']) == 3
+
+
+def test_stale_catalog_entries_are_refreshed(cache):
+    select(cache, category_type='Adult')
+    catalog_path = os.path.join(os.path.dirname(cache.manifest_path), 'catalog.json')
+    with open(catalog_path) as f:
+        saved = json.load(f)
+    # An entry left from an earlier version of the file, and a file the catalog never saw
+    for entry in saved['files'].values():
+        if entry['category'] == 'Juvenile Girls U14':
+            entry.update(hash='earlier', category='STAR 5 Women', category_type='STARSkate')
+    saved['files'] = {pdf_file: entry for pdf_file, entry in saved['files'].items() if not pdf_file.endswith('adult.pdf')}
+    with open(catalog_path, 'w') as f:
+        json.dump(saved, f)
+
+    assert select(cache, category_type='STARSkate') == ['star.pdf']
+    assert select(cache, category_type='Adult') == ['adult.pdf']
@@ -0,0 +1,49 @@
+"""
+Accepted competitor proposals in maps/competitor_mapping.csv normalizing the Competitor column, without every
+unmapped competitor being reported as a miss, and the matcher leaving the spellings the map covers out.
+"""
+
+import os
+import shutil
+
+import pandas as pd
+
+import fuzzy_match
+import processor
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_competitor_map_normalizes_without_counting_misses(tmp_path):
+    maps_dir = tmp_path / 'maps'
+    shutil.copytree(os.path.join(REPO_DIR, 'maps'), maps_dir)
+    with open(maps_dir / 'competitor_mapping.csv', 'w') as f:
+        f.write("Scraped,Normalized\nAnn Smyth,Ann Smith\n")
+    registry = processor.MappingRegistry(str(maps_dir))
+
+    cat_results = pd.DataFrame({'Competitor': ['ann smyth ', 'Beth Jones', None]})
+    cat_results = processor.correct_competitor_names(cat_results, registry)
+
+    assert cat_results['Competitor'].tolist()[:2] == ['Ann Smith', 'Beth Jones']
+    stats = registry.take_stats()
+    assert stats['hits'] == {'competitor': 1}
+    assert 'competitor' not in stats['misses']
+
+
+def test_mapped_spellings_are_not_proposed_again(tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO_DIR)
+    cache = processor.ParseCache(str(tmp_path / 'cache'))
+    pdf_file = str(tmp_path / 'a.pdf')
+    with open(pdf_file, 'w') as f:
+        f.write('a')
+    results = pd.DataFrame({'Competitor': ['Ann Smith', 'Ann Smith', 'Ann Smyth', 'Beth Jones']})
+    cache.put(pdf_file, {"valid": True, "header": None, "results": results, "unable_to_scan": False, "error": None,
+                         "error_stage": None, "mapping_stats": None, "timings": None})
+    cache.save(list(cache.files))
+    maps_dir = tmp_path / 'maps'
+    maps_dir.mkdir()
+
+    assert fuzzy_match.competitor_names(str(tmp_path / 'cache'), str(maps_dir))['Ann Smyth'] == 1
+    with open(maps_dir / 'competitor_mapping.csv', 'w') as f:
+        f.write("Scraped,Normalized\nAnn Smyth,Ann Smith\n")
+    assert 'Ann Smyth' not in fuzzy_match.competitor_names(str(tmp_path / 'cache'), str(maps_dir))
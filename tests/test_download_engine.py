@@ -0,0 +1,57 @@
+"""
+Content de-duplication in the download engine, against a local server that answers every path with the same PDF,
+the way the website serves a PDF under its own name and under the name scrape_pdf_urls() leaves when it strips the
+"?" from "GoldWomenArtisticCR.pdf?ver=2".
+"""
+
+import http.server
+import os
+import threading
+
+import pytest
+
+import downloader
+
+PDF = b'%PDF-1.4\n% the same Category Results Summary under every name\n%%EOF\n'
+
+
+class SamePdfHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(PDF)))
+        self.end_headers()
+        self.wfile.write(PDF)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), SamePdfHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+
+
+@pytest.mark.parametrize('names', [['GoldWomenArtisticCR.pdfver=2', 'GoldWomenArtisticCR.pdf'],
+                                   ['GoldWomenArtisticCR.pdf', 'GoldWomenArtisticCR.pdfver=2']])
+def test_duplicate_keeps_the_pdf_name(base_url, tmp_path, names):
+    manifest = downloader.DownloadManifest(str(tmp_path / 'manifest.json'))
+    engine = downloader.DownloadEngine(retries=0, manifest=manifest)
+    results = [engine.fetch(base_url + name, str(tmp_path)) for name in names]
+
+    pdf_path = str(tmp_path / 'GoldWomenArtisticCR.pdf')
+    assert os.listdir(tmp_path) == ['GoldWomenArtisticCR.pdf']
+    assert results[names.index('GoldWomenArtisticCR.pdf')] == (pdf_path, 'downloaded')
+    assert {entry['path'] for entry in manifest.entries.values()} == {pdf_path}
+
+
+def test_duplicate_of_another_pdf_name_is_not_saved(base_url, tmp_path):
+    engine = downloader.DownloadEngine(retries=0, manifest=downloader.DownloadManifest())
+    first = engine.fetch(base_url + 'GoldWomenArtisticCR.pdf', str(tmp_path))
+    second = engine.fetch(base_url + 'GoldWomenArtisticCR-2.pdf', str(tmp_path))
+
+    assert second == (first[0], 'duplicate')
+    assert os.listdir(tmp_path) == ['GoldWomenArtisticCR.pdf']
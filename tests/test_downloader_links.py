@@ -0,0 +1,87 @@
+"""
+The link filtering shared by the static and the browser-rendered event pages, run over saved event pages.
+
+event_page_onclick.html is a current event page, whose RESULTS buttons open the PDF from their onclick attribute.
+event_page_archive.html is an older results archive page, which links the PDFs with plain hrefs.
+"""
+
+import os
+
+import downloader
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+EVENT_URL = 'https://skateabnwtnun.ca/events/2022-calgary-winter-invitational/'
+ARCHIVE_URL = 'https://skateabnwtnun.ca/results/2018-sectionals/'
+UPLOADS = 'https://skateabnwtnun.ca/wp-content/uploads/'
+
+
+def page_links(fixture, page_url):
+    collector = downloader.LinkCollector(page_url)
+    with open(os.path.join(FIXTURES_DIR, fixture), encoding='utf-8') as f:
+        collector.feed(f.read())
+    return collector.links
+
+
+def test_collector_resolves_hrefs_and_keeps_onclick():
+    links = page_links('event_page_onclick.html', EVENT_URL)
+    assert ('Schedule', UPLOADS + '2022/11/Schedule.pdf', None) in links
+    assert ('RESULTS', None, "window.open('/wp-content/uploads/2022/11/PreNoviceWomenSPCR.pdf', '_blank')") in links
+    # A bare "#" href resolves to the page itself, like the browser's link.href
+    assert (' RESULTS ', EVENT_URL, "window.open('/wp-content/uploads/2022/11/AdultBronzeWomenCR.pdf', '_blank')") in links
+
+
+def test_onclick_results_links():
+    pdf_urls = downloader.filter_pdf_links(page_links('event_page_onclick.html', EVENT_URL))
+    assert pdf_urls == [
+        UPLOADS + '2022/11/PreNoviceWomenSPCR.pdf',
+        UPLOADS + '2022/11/JuvenileWomenU14FSCR-2.pdf',
+        UPLOADS + '2022/11/AdultBronzeWomenCR.pdf',
+    ]
+
+
+def test_onclick_links_skip_other_sheets_and_excluded_categories():
+    pdf_urls = downloader.filter_pdf_links(page_links('event_page_onclick.html', EVENT_URL))
+    # Judges' details, STAR 3 and 4, Team, an onclick that opens no PDF, and links that are not RESULTS
+    for name in ['JuvenileWomenU14FSJD', 'STAR3WomenCR', 'star-4-MenCR', 'TeamElementsCR', 'star5', 'Schedule']:
+        assert not any(name in pdf_url for pdf_url in pdf_urls)
+
+
+def test_archive_cr_hrefs():
+    pdf_urls = downloader.filter_pdf_links(page_links('event_page_archive.html', ARCHIVE_URL))
+    assert pdf_urls[:4] == [
+        UPLOADS + '2017/11/SeniorWomenFSCR.pdf',
+        UPLOADS + '2017/11/SeniorWomenFSCR-2.pdf',
+        UPLOADS + '2017/11/NoviceMenSPCR.pdf',
+        ARCHIVE_URL + 'uploads/JuniorWomenSPCR.pdf',
+    ]
+
+
+def test_archive_skips_other_sheets_excluded_categories_and_other_text():
+    pdf_urls = downloader.filter_pdf_links(page_links('event_page_archive.html', ARCHIVE_URL))
+    # Judges' details, STAR 2 and 3, Team, and a CR.pdf whose link text does not say results
+    for name in ['SeniorWomenFSJD', 'STAR2WomenCR', 'Star-3-MenCR-1', 'TeamCompetitionCR', 'PreJuvenileGirlsCR']:
+        assert not any(name in pdf_url for pdf_url in pdf_urls)
+
+
+def test_query_string_variants():
+    pdf_urls = downloader.filter_pdf_links(page_links('event_page_archive.html', ARCHIVE_URL))
+    # The "?" is removed and the rest of the query kept, as the original scraper did
+    assert UPLOADS + '2017/11/GoldWomenArtisticCR.pdfver=2' in pdf_urls
+    # A query before a .pdf ending, e.g. a download script's file parameter, has its "?" removed too
+    links = [('Event Results', 'https://skateabnwtnun.ca/download.php?file=EventResults.pdf', None)]
+    assert downloader.filter_pdf_links(links) == ['https://skateabnwtnun.ca/download.phpfile=EventResults.pdf']
+
+
+def test_results_links_without_href():
+    links = page_links('event_page_archive.html', ARCHIVE_URL)
+    assert ('Results coming soon', None, None) in links
+    assert ('Results by category', None, 'return false;') in links
+    assert downloader.filter_pdf_links([('Results coming soon', None, None), ('Results by category', None, 'return false;'),
+                                        ('RESULTS', None, None)]) == []
+
+
+def test_excluded_categories_match_any_case():
+    for word in downloader.CATEGORIES_TO_EXCLUDE:
+        onclick = f"window.open('/wp-content/uploads/2022/11/{word.upper()}WomenCR.pdf', '_blank')"
+        assert downloader.filter_pdf_links([('RESULTS', None, onclick)]) == []
+        assert downloader.filter_pdf_links([('Results', f'/wp-content/uploads/{word}WomenCR.pdf', None)]) == []
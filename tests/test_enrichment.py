@@ -0,0 +1,47 @@
+"""
+The vectorized enrichment of the category, competition and results tables, against saved frames holding what the
+row-at-a-time determine_category_type(), category_program_type(), determine_season(), is_Championship() and
+create_rank_bins() it replaced gave for the same names, dates and ranks.
+"""
+
+import os
+
+import pandas as pd
+
+import processor
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def fixture(name, **kwargs):
+    return pd.read_csv(os.path.join(FIXTURES_DIR, name), **kwargs)
+
+
+def test_enrich_categories_matches_row_at_a_time_rules():
+    expected = fixture('enrichment_categories.csv')
+    program_type_df = processor.new_program_type_df()
+    category_df = processor.enrich_categories(expected[['Category_Name']].copy(), program_type_df)
+    category_df['Program_Type'] = category_df['Program_Type'].map(program_type_df['Program_Type'])
+    pd.testing.assert_frame_equal(category_df, expected, check_dtype=False)
+
+
+def test_enrich_competitions_matches_row_at_a_time_seasons():
+    expected = fixture('enrichment_competitions.csv', dtype={'Start_Date': str, 'Season': str}, keep_default_na=False)
+    first_category_types = expected.pop('First_Category_Type')
+    # The row-at-a-time code raised on a blank start date, which has no season now
+    expected['Season'] = expected['Season'].replace('', None)
+    competition_df = processor.enrich_competitions(expected[['Competition_Name', 'Start_Date']].copy(), first_category_types)
+    pd.testing.assert_frame_equal(competition_df, expected, check_dtype=False)
+
+
+def test_blank_start_date_has_no_season():
+    competition_df = pd.DataFrame({'Competition_Name': ['2017 Wild Rose Invitational'], 'Start_Date': ['']})
+    competition_df = processor.enrich_competitions(competition_df, pd.Series(['STARSkate']))
+    assert competition_df['Season'].isna().all()
+
+
+def test_create_rank_bins_matches_row_at_a_time_bins():
+    expected = fixture('enrichment_rank_bins.csv')
+    results_df = processor.create_rank_bins(expected[['Rank']].astype('int16'))
+    assert results_df['rank_bin'].astype(str).tolist() == expected['rank_bin'].tolist()
+    assert results_df['rank_bin'].cat.categories.tolist() == processor.RANK_BINS
@@ -0,0 +1,58 @@
+"""
+Reading the competition, start date and category from the header of saved Category Results Summaries whose header
+is short (it ends at the date, like 2018PeaceSTAR-7WomenCR.pdf in error.log) or runs below the header strip.
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+import processor
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(REPO_DIR, 'tests', 'fixtures')
+
+
+@pytest.fixture(autouse=True)
+def in_repo_dir(monkeypatch):
+    # The name mappings are read from maps/ relative to the working directory
+    monkeypatch.chdir(REPO_DIR)
+
+
+def details(fixture):
+    return processor.competition_details(os.path.join(FIXTURES_DIR, fixture))
+
+
+def test_short_header_takes_the_category_from_the_file_name():
+    _, start_date, category = details('2018PeaceSTAR-7WomenCR.pdf')
+    assert start_date == 'November 2018'
+    assert category == processor.mappings.normalize('category', 'STAR 7 Women')
+
+
+def test_file_name_category_keeps_age_groups_whole():
+    _, start_date, category = details('2019CalgaryJuvenileGirlsU14CR.pdf')
+    assert (start_date, category) == ('Nov 2019', 'Juvenile Girls U14')
+    category_df = processor.enrich_categories(pd.DataFrame({'Category_Name': [category]}), processor.new_program_type_df())
+    assert category_df['Category_Type'].tolist() == ['Competitive']
+
+
+def test_header_running_below_the_strip_is_read_in_the_same_pass():
+    import pdfplumber
+
+    with pdfplumber.open(os.path.join(FIXTURES_DIR, 'header_below_strip.pdf')) as pdf_document:
+        lines, lines_below = processor.header_lines(pdf_document.pages[0])
+    assert lines == ['2018 Peace Region STARSkate Invitational', 'November 3-4, 2018']
+    # The lines below the strip stop at the results table's column header row
+    assert lines_below == ['STAR 7 Women']
+    assert details('header_below_strip.pdf')[2] == processor.mappings.normalize('category', 'STAR 7 Women')
+
+
+@pytest.mark.parametrize('file_name, competition_name, category', [
+    ('2018PeaceSTAR-7WomenCR.pdf', '2018 Peace Region STARSkate Invitational', 'STAR 7 Women'),
+    ('2019CalgaryJuvenileGirlsU14CR-2.pdf', '2019 Calgary Winter Invitational', 'Juvenile Girls U14'),
+    ('AdultGoldWomenArtisticCR.pdf', '2020 Adult Championships', 'Adult Gold Women Artistic'),
+    ('Schedule.pdf', '2019 Calgary Winter Invitational', None),
+])
+def test_category_from_file_name(file_name, competition_name, category):
+    assert processor.category_from_file_name(file_name, competition_name) == category